@@ -2,13 +2,26 @@
 
 from __future__ import annotations
 
-import datetime as dt
-from typing import Dict, Optional
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Dict, Mapping, Optional, Sequence
 
 import requests
 import streamlit as st
-
-from database import add_scan, get_scan_history, get_weekly_impact_points, init_db
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from database import (
+    add_scan,
+    get_cached_product,
+    get_max_scan_id,
+    get_scan_history_raw,
+    get_weekly_impact_points,
+    init_db,
+    store_cached_product,
+)
 from disposal import get_disposal_instruction
 from scoring import score_product, suggest_alternative
 
@@ -16,140 +29,199 @@ APP_TITLE = "EcoScan AI"
 APP_SUBTITLE = "Scan. Understand. Reduce."
 CITY_OPTIONS = ["San Francisco", "Chicago"]
 
-
-def inject_css(impact_score: Optional[str]) -> None:
-    """Inject custom CSS theme with gradient and premium card styling."""
-    gradient_map = {
-        "Green": "linear-gradient(135deg, #0f2027 0%, #203a43 45%, #2e8b57 100%)",
-        "Yellow": "linear-gradient(135deg, #3a2f0b 0%, #6a5d1f 45%, #8b7b2e 100%)",
-        "Red": "linear-gradient(135deg, #2b0f14 0%, #5b1f2a 45%, #8b2e3b 100%)",
-    }
-    gradient = gradient_map.get(
-        impact_score, "linear-gradient(135deg, #0b1722 0%, #1f2e45 45%, #2c5364 100%)"
-    )
-
-    st.markdown(
-        f"""
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=Manrope:wght@400;600;700;800&display=swap');
-            html, body, [class*="css"] {{
-                font-family: 'Manrope', sans-serif;
-            }}
-            .stApp {{
-                background: {gradient};
-                color: #f8fbff;
-            }}
-            .block-container {{
-                max-width: 1100px;
-                padding-top: 2rem;
-                padding-bottom: 3rem;
-            }}
-            .hero {{
-                background: rgba(255, 255, 255, 0.08);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                border-radius: 24px;
-                padding: 1.8rem;
-                box-shadow: 0 12px 40px rgba(0, 0, 0, 0.25);
-                backdrop-filter: blur(6px);
-                margin-bottom: 1.4rem;
-            }}
+OPEN_FOOD_FACTS_FIELDS = (
+    "product_name,product_name_en,image_url,categories_tags,labels_tags,"
+    "packaging_tags,packaging,ingredients_text,nova_group"
+)
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+PREFETCH_WAIT_SECONDS = 10
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]),
+    ),
+)
+_SESSION.headers.update({"Accept-Encoding": "gzip", "User-Agent": "EcoScanAI/1.0"})
+
+
+_GRADIENTS = {
+    "Green": "linear-gradient(135deg, #0f2027 0%, #203a43 45%, #2e8b57 100%)",
+    "Yellow": "linear-gradient(135deg, #3a2f0b 0%, #6a5d1f 45%, #8b7b2e 100%)",
+    "Red": "linear-gradient(135deg, #2b0f14 0%, #5b1f2a 45%, #8b2e3b 100%)",
+}
+_DEFAULT_GRADIENT = "linear-gradient(135deg, #0b1722 0%, #1f2e45 45%, #2c5364 100%)"
+_CSS_TEMPLATE = """
+    <style>
+        @import url('https://fonts.googleapis.com/css2?family=Manrope:wght@400;600;700;800&display=swap');
+        html, body, [class*="css"] {{
+            font-family: 'Manrope', sans-serif;
+        }}
+        .stApp {{
+            background: {gradient};
+            color: #f8fbff;
+        }}
+        .block-container {{
+            max-width: 1100px;
+            padding-top: 2rem;
+            padding-bottom: 3rem;
+        }}
+        .hero {{
+            background: rgba(255, 255, 255, 0.08);
+            border: 1px solid rgba(255, 255, 255, 0.2);
+            border-radius: 24px;
+            padding: 1.8rem;
+            box-shadow: 0 12px 40px rgba(0, 0, 0, 0.25);
+            backdrop-filter: blur(6px);
+            margin-bottom: 1.4rem;
+        }}
+        .hero h1 {{
+            font-size: 3rem;
+            margin: 0;
+            line-height: 1.1;
+            letter-spacing: -0.03em;
+        }}
+        .subtitle {{
+            font-size: 1.1rem;
+            margin-top: 0.4rem;
+            opacity: 0.92;
+        }}
+        .card {{
+            background: rgba(255, 255, 255, 0.09);
+            border: 1px solid rgba(255, 255, 255, 0.18);
+            border-radius: 20px;
+            padding: 1.2rem;
+            box-shadow: 0 10px 30px rgba(0, 0, 0, 0.2);
+            margin-bottom: 1rem;
+        }}
+        .stat {{
+            font-size: 1.8rem;
+            font-weight: 800;
+            margin-bottom: 0.15rem;
+        }}
+        .stat-label {{
+            font-size: 0.92rem;
+            opacity: 0.85;
+        }}
+        .impact-badge {{
+            display: inline-block;
+            padding: 0.45rem 0.9rem;
+            border-radius: 999px;
+            font-weight: 800;
+            font-size: 0.9rem;
+            letter-spacing: 0.01em;
+        }}
+        .impact-green {{
+            background: rgba(46, 139, 87, 0.2);
+            color: #8cffc0;
+            border: 1px solid rgba(140, 255, 192, 0.5);
+        }}
+        .impact-yellow {{
+            background: rgba(224, 196, 84, 0.24);
+            color: #ffe18e;
+            border: 1px solid rgba(255, 225, 142, 0.45);
+        }}
+        .impact-red {{
+            background: rgba(206, 72, 98, 0.24);
+            color: #ff9ab0;
+            border: 1px solid rgba(255, 154, 176, 0.45);
+        }}
+        .section-title {{
+            margin-bottom: 0.7rem;
+            font-size: 1.1rem;
+            font-weight: 700;
+        }}
+        .history-row {{
+            display: grid;
+            grid-template-columns: 2fr 1fr 1fr 1.2fr;
+            gap: 0.8rem;
+            padding: 0.7rem 0;
+            border-bottom: 1px solid rgba(255, 255, 255, 0.15);
+            font-size: 0.92rem;
+        }}
+        .history-head {{
+            font-weight: 700;
+            opacity: 0.9;
+        }}
+        @media (max-width: 800px) {{
             .hero h1 {{
-                font-size: 3rem;
-                margin: 0;
-                line-height: 1.1;
-                letter-spacing: -0.03em;
-            }}
-            .subtitle {{
-                font-size: 1.1rem;
-                margin-top: 0.4rem;
-                opacity: 0.92;
-            }}
-            .card {{
-                background: rgba(255, 255, 255, 0.09);
-                border: 1px solid rgba(255, 255, 255, 0.18);
-                border-radius: 20px;
-                padding: 1.2rem;
-                box-shadow: 0 10px 30px rgba(0, 0, 0, 0.2);
-                margin-bottom: 1rem;
-            }}
-            .stat {{
-                font-size: 1.8rem;
-                font-weight: 800;
-                margin-bottom: 0.15rem;
-            }}
-            .stat-label {{
-                font-size: 0.92rem;
-                opacity: 0.85;
-            }}
-            .impact-badge {{
-                display: inline-block;
-                padding: 0.45rem 0.9rem;
-                border-radius: 999px;
-                font-weight: 800;
-                font-size: 0.9rem;
-                letter-spacing: 0.01em;
-            }}
-            .impact-green {{
-                background: rgba(46, 139, 87, 0.2);
-                color: #8cffc0;
-                border: 1px solid rgba(140, 255, 192, 0.5);
-            }}
-            .impact-yellow {{
-                background: rgba(224, 196, 84, 0.24);
-                color: #ffe18e;
-                border: 1px solid rgba(255, 225, 142, 0.45);
-            }}
-            .impact-red {{
-                background: rgba(206, 72, 98, 0.24);
-                color: #ff9ab0;
-                border: 1px solid rgba(255, 154, 176, 0.45);
-            }}
-            .section-title {{
-                margin-bottom: 0.7rem;
-                font-size: 1.1rem;
-                font-weight: 700;
+                font-size: 2.2rem;
             }}
             .history-row {{
-                display: grid;
-                grid-template-columns: 2fr 1fr 1fr 1.2fr;
-                gap: 0.8rem;
-                padding: 0.7rem 0;
-                border-bottom: 1px solid rgba(255, 255, 255, 0.15);
-                font-size: 0.92rem;
-            }}
-            .history-head {{
-                font-weight: 700;
-                opacity: 0.9;
+                grid-template-columns: 1fr;
+                gap: 0.35rem;
             }}
-            @media (max-width: 800px) {{
-                .hero h1 {{
-                    font-size: 2.2rem;
-                }}
-                .history-row {{
-                    grid-template-columns: 1fr;
-                    gap: 0.35rem;
-                }}
-            }}
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+        }}
+    </style>
+    """
+# Only four themes exist, so render each stylesheet once at import.
+_CSS_VARIANTS = {score: _CSS_TEMPLATE.format(gradient=gradient) for score, gradient in _GRADIENTS.items()}
+_CSS_VARIANTS[None] = _CSS_TEMPLATE.format(gradient=_DEFAULT_GRADIENT)
+
+
+def inject_css(impact_score: Optional[str]) -> None:
+    """Inject custom CSS theme with gradient and premium card styling."""
+    st.markdown(_CSS_VARIANTS.get(impact_score, _CSS_VARIANTS[None]), unsafe_allow_html=True)
 
 
 def fetch_product(barcode: str) -> Optional[Dict]:
-    """Fetch product data from Open Food Facts by barcode."""
-    url = f"https://world.openfoodfacts.org/api/v2/product/{barcode}.json"
+    """Fetch product data from Open Food Facts by barcode, revalidating any cached copy."""
+    url = f"https://world.openfoodfacts.org/api/v2/product/{barcode}.json?fields={OPEN_FOOD_FACTS_FIELDS}"
+    cached = get_cached_product(barcode)
+    headers = {}
+    if cached:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
     try:
-        response = requests.get(url, timeout=10)
+        response = _SESSION.get(url, timeout=10, headers=headers)
+        if response.status_code == 304 and cached:
+            return json.loads(gzip.decompress(cached["payload"]))["product"]
         response.raise_for_status()
         payload = response.json()
         if payload.get("status") == 1 and payload.get("product"):
+            # Not-found responses are never cached so later contributions become visible.
+            store_cached_product(
+                barcode,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                gzip.compress(response.content),
+            )
             return payload["product"]
     except requests.RequestException:
         return None
     return None
 
 
+def _prefetch_product() -> None:
+    """Start fetching as soon as the barcode is entered so the scan click often finds it ready."""
+    barcode = st.session_state.get("barcode_input", "").strip()
+    if barcode:
+        st.session_state["_prefetch"] = (barcode, _EXECUTOR.submit(fetch_product, barcode))
+
+
+def _take_product(barcode: str) -> Optional[Dict]:
+    prefetch = st.session_state.pop("_prefetch", None)
+    if prefetch and prefetch[0] == barcode:
+        try:
+            return prefetch[1].result(timeout=PREFETCH_WAIT_SECONDS)
+        except FuturesTimeoutError:
+            # fetch_product's own timeout plus retries can outlast the wait; fetch directly.
+            pass
+    return fetch_product(barcode)
+
+
+# cache_resource keeps the rows as-is; cache_data would have to pickle them, which sqlite3.Row cannot do.
+@st.cache_resource(ttl=30)
+def load_dashboard(token: int) -> Dict:
+    """Load history and weekly points; `token` is the newest scan id so new scans miss the cache."""
+    return {"history": get_scan_history_raw(limit=100), "weekly": get_weekly_impact_points()}
+
+
 def impact_badge_html(impact_score: str) -> str:
     """Return HTML for an impact badge."""
     labels = {
@@ -207,13 +279,15 @@ def render_header(total_scans: int, weekly_points: int) -> None:
         )
 
 
-def render_history(history: list[Dict]) -> None:
+_ROW_TMPL = "<div class='history-row'><div>{p}</div><div>{c}</div><div>{i}</div><div>{t}</div></div>".format
+
+
+def render_history(history: Sequence[Mapping]) -> None:
     st.markdown("<div class='section-title'>Scan History</div>", unsafe_allow_html=True)
     if not history:
         st.info("No scans yet. Start by scanning your first product.")
         return
-    st.markdown(
-        """
+    header_html = """
         <div class="card">
             <div class="history-row history-head">
                 <div>Product</div>
@@ -221,28 +295,14 @@ def render_history(history: list[Dict]) -> None:
                 <div>Impact</div>
                 <div>Timestamp</div>
             </div>
-        """,
-        unsafe_allow_html=True,
+        """
+    # One element for the whole table instead of one Streamlit delta per row.
+    row_html, label = _ROW_TMPL, history_impact_label
+    rows_html = "".join(
+        row_html(p=row["product_name"], c=row["city"], i=label(row["impact_score"]), t=row["timestamp_display"])
+        for row in history
     )
-
-    for row in history:
-        ts = row["timestamp"]
-        try:
-            formatted_ts = dt.datetime.fromisoformat(ts).strftime("%Y-%m-%d %H:%M")
-        except ValueError:
-            formatted_ts = ts
-        st.markdown(
-            f"""
-            <div class="history-row">
-                <div>{row["product_name"]}</div>
-                <div>{row["city"]}</div>
-                <div>{history_impact_label(row["impact_score"])}</div>
-                <div>{formatted_ts}</div>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
-    st.markdown("</div>", unsafe_allow_html=True)
+    st.markdown(header_html + rows_html + "</div>", unsafe_allow_html=True)
 
 
 def main() -> None:
@@ -253,8 +313,9 @@ def main() -> None:
         initial_sidebar_state="collapsed",
     )
     init_db()
-    history = get_scan_history(limit=100)
-    weekly_points = get_weekly_impact_points()
+    dashboard = load_dashboard(get_max_scan_id())
+    history = dashboard["history"]
+    weekly_points = dashboard["weekly"]
 
     if "current_impact" not in st.session_state:
         st.session_state.current_impact = None
@@ -269,7 +330,12 @@ def main() -> None:
 
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.markdown("<div class='section-title'>Barcode Input</div>", unsafe_allow_html=True)
-    barcode = st.text_input("Enter barcode", placeholder="e.g. 737628064502")
+    barcode = st.text_input(
+        "Enter barcode",
+        placeholder="e.g. 737628064502",
+        key="barcode_input",
+        on_change=_prefetch_product,
+    )
     scan_clicked = st.button("Scan Product", use_container_width=True)
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -278,7 +344,7 @@ def main() -> None:
             st.warning("Enter a barcode to scan.")
         else:
             with st.spinner("Scanning product..."):
-                product = fetch_product(barcode.strip())
+                product = _take_product(barcode.strip())
 
             if not product:
                 st.error("Product not found in Open Food Facts. Try another barcode.")
@@ -302,6 +368,7 @@ def main() -> None:
                     impact_score=impact_score,
                     disposal_type=disposal["type"],
                 )
+                load_dashboard.clear()
 
                 st.markdown("<div class='section-title'>Results</div>", unsafe_allow_html=True)
                 left, right = st.columns([1.1, 1.4])
@@ -332,18 +399,16 @@ def main() -> None:
 
                 st.rerun()
 
-    refreshed_history = get_scan_history(limit=100)
-    refreshed_weekly = get_weekly_impact_points()
     st.markdown(
         f"""
         <div class="card">
             <div class="section-title">Weekly Environmental Tracking</div>
-            Total weekly environmental score: <strong>{refreshed_weekly} pts</strong>
+            Total weekly environmental score: <strong>{weekly_points} pts</strong>
         </div>
         """,
         unsafe_allow_html=True,
     )
-    render_history(refreshed_history)
+    render_history(history)
 
 
 if __name__ == "__main__":
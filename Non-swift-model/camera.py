@@ -2,21 +2,67 @@
 
 from __future__ import annotations
 
+import logging
 import os
+import queue
+import sys
+import threading
 import time
+from ctypes import c_void_p, string_at
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Callable, Optional
+from typing import Callable, Iterator, Optional, Sequence
 
 import cv2
+import numpy as np
 
 # Ensure pyzbar can locate libzbar on macOS Homebrew installs.
 os.environ.setdefault("DYLD_FALLBACK_LIBRARY_PATH", "/opt/homebrew/lib:/usr/local/lib")
 
-from pyzbar.pyzbar import decode
+from pyzbar.pyzbar import ZBarSymbol
+from pyzbar.wrapper import (
+    ZBarConfig,
+    zbar_image_create,
+    zbar_image_destroy,
+    zbar_image_first_symbol,
+    zbar_image_scanner_create,
+    zbar_image_scanner_destroy,
+    zbar_image_scanner_set_config,
+    zbar_image_set_data,
+    zbar_image_set_format,
+    zbar_image_set_size,
+    zbar_scan_image,
+    zbar_symbol_get_data,
+    zbar_symbol_get_data_length,
+    zbar_symbol_next,
+)
 
 
 FrameCallback = Callable[[any], None]
 
+# Retail food packaging only carries EAN/UPC codes; every extra symbology costs zbar a locator pass.
+DEFAULT_SYMBOLS = (ZBarSymbol.EAN13, ZBarSymbol.EAN8, ZBarSymbol.UPCA, ZBarSymbol.UPCE)
+
+_LINEAR_SYMBOLS = frozenset(
+    (ZBarSymbol.EAN13, ZBarSymbol.EAN8, ZBarSymbol.UPCA, ZBarSymbol.UPCE, ZBarSymbol.CODE128)
+)
+
+MAX_CONSECUTIVE_GRAB_FAILURES = 30
+EDGE_SCAN_EVERY = 5
+
+# zbar fourcc for 8-bit single-plane luminance.
+_Y800 = int.from_bytes(b"Y800", "little")
+
+# Resolved once: a wrong backend (e.g. AVFoundation on Linux) makes OpenCV fall back slowly on every open.
+_BACKEND = {
+    "darwin": cv2.CAP_AVFOUNDATION,
+    "linux": cv2.CAP_V4L2,
+    "win32": cv2.CAP_DSHOW,
+}.get(sys.platform, cv2.CAP_ANY)
+
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class CameraScanResult:
@@ -25,38 +71,346 @@ class CameraScanResult:
     frames_seen: int
 
 
-def find_first_readable_camera(indices: list[int]) -> Optional[int]:
-    """Return the first camera index that can open and read at least one frame."""
-    backend = cv2.CAP_AVFOUNDATION if os.name == "posix" else cv2.CAP_ANY
-    for idx in indices:
-        capture = cv2.VideoCapture(idx, backend)
-        if not capture.isOpened():
-            capture.release()
-            continue
-        ok, _ = capture.read()
+class _FrameGrabber:
+    """Background thread that keeps the capture drained into a single latest-frame slot.
+
+    Frames are triple-buffered: the thread retrieves into ``_back``, publishes by
+    swapping it with ``_ready``, and ``latest`` hands ``_ready`` to the consumer as
+    ``_front``. Buffers are reused via ``retrieve(dst)`` instead of allocating a
+    fresh ~2.7 MB array per frame.
+    """
+
+    def __init__(self, capture: cv2.VideoCapture) -> None:
+        self._capture = capture
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._back = None
+        self._ready = None
+        self._front = None
+        self._seq = 0
+        # Grabs per retrieved frame; raised while decode is slower than the camera frame rate.
+        self.stride = 1
+        self.failed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+    def _run(self) -> None:
+        grabbed = 0
+        failures = 0
+        while not self._stop.is_set():
+            if not self._capture.grab():
+                failures += 1
+                if failures > MAX_CONSECUTIVE_GRAB_FAILURES:
+                    with self._cond:
+                        self.failed = True
+                        self._cond.notify()
+                    return
+                # Back off instead of spinning while the camera wakes up.
+                time.sleep(0.005)
+                continue
+            failures = 0
+            grabbed += 1
+            if grabbed < self.stride:
+                continue
+            grabbed = 0
+            # OpenCV writes into the destination in place when shape and dtype already match.
+            ok, frame = self._capture.retrieve(self._back)
+            if not ok:
+                continue
+            with self._cond:
+                self._back, self._ready = self._ready, frame
+                self._seq += 1
+                self._cond.notify()
+
+    def latest(self, after_seq: int, timeout: float) -> tuple[int, Optional[any]]:
+        """Return (seq, frame) for a frame newer than ``after_seq``, or (after_seq, None).
+
+        The frame stays valid only until the next call, when its buffer is recycled.
+        """
+        with self._cond:
+            if self._seq == after_seq:
+                self._cond.wait(timeout)
+            if self._seq == after_seq:
+                return after_seq, None
+            self._front, self._ready = self._ready, self._front
+            return self._seq, self._front
+
+
+class _PreviewWorker:
+    """Runs the caller's on_frame callback off the scan thread, always on the newest frame."""
+
+    def __init__(self, on_frame: FrameCallback, min_interval: float) -> None:
+        self._on_frame = on_frame
+        self._min_interval = min_interval
+        self._next_submit = 0.0
+        # Set before the final join times out, so a late frame is never drawn after close returns.
+        self._closed = False
+        self._queue: queue.Queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame: any) -> None:
+        now = time.monotonic()
+        if now < self._next_submit:
+            return
+        self._next_submit = now + self._min_interval
+        # Copy because the grabber recycles frame buffers; throttled frames skip the copy.
+        self._put_latest(frame.copy())
+
+    def close(self) -> None:
+        self._closed = True
+        self._put_latest(None)
+        self._thread.join(timeout=1.0)
+
+    def _put_latest(self, item: any) -> None:
+        # Only the scan thread puts, so after discarding a stale frame there is always room.
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._queue.put_nowait(item)
+
+    def _run(self) -> None:
+        while True:
+            frame = self._queue.get()
+            if frame is None or self._closed:
+                return
+            try:
+                self._on_frame(frame)
+            except Exception:  # noqa: BLE001
+                logger.exception("on_frame preview callback failed.")
+
+
+def _open_capture(camera_index: int) -> cv2.VideoCapture:
+    """Open a capture with the driver-side frame queue shrunk to a single frame."""
+    capture = cv2.VideoCapture(camera_index, _BACKEND)
+    # Default V4L/AVFoundation buffers hold ~4 frames, so read() would return stale images.
+    if not capture.set(cv2.CAP_PROP_BUFFERSIZE, 1):
+        logger.warning("Camera index %s ignored CAP_PROP_BUFFERSIZE=1.", camera_index)
+    return capture
+
+
+def _request_mjpeg(capture: cv2.VideoCapture) -> None:
+    """Ask the camera for compressed MJPEG frames; cameras that refuse keep their default."""
+    mjpg = cv2.VideoWriter_fourcc(*"MJPG")
+    capture.set(cv2.CAP_PROP_FOURCC, mjpg)
+    if int(capture.get(cv2.CAP_PROP_FOURCC)) != mjpg:
+        logger.debug("Camera did not accept MJPEG; keeping the driver default format.")
+
+
+def _center_crop(frame: any, fraction: tuple[float, float]) -> any:
+    """Return a view of the centered region users aim the barcode at."""
+    height, width = frame.shape[:2]
+    frac_w, frac_h = fraction
+    x0 = int(width * (1.0 - frac_w) / 2)
+    y0 = int(height * (1.0 - frac_h) / 2)
+    return frame[y0 : height - y0, x0 : width - x0]
+
+
+@contextmanager
+def open_camera(camera_index: int) -> Iterator[cv2.VideoCapture]:
+    """Open a camera once so probe and scan can share the same device handle."""
+    capture = _open_capture(camera_index)
+    try:
+        yield capture
+    finally:
         capture.release()
-        if ok:
-            return idx
+
+
+def _prepare_decode_image(
+    frame: any,
+    roi_fraction: Optional[tuple[float, float]],
+    decode_scale: float,
+    fast_gray: bool = True,
+) -> any:
+    """Crop, downscale and grayscale a BGR frame into the plane handed to zbar."""
+    roi = _center_crop(frame, roi_fraction) if roi_fraction else frame
+    small = roi
+    if decode_scale != 1.0:
+        small = cv2.resize(roi, None, fx=decode_scale, fy=decode_scale, interpolation=cv2.INTER_AREA)
+    if fast_gray:
+        # Green carries most of the luminance and zbar only thresholds, so skip the color transform.
+        return np.ascontiguousarray(small[:, :, 1])
+    # Hand zbar a single luminance plane instead of letting pyzbar slice the BGR frame.
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def _binarize(gray: any) -> any:
+    """Otsu-threshold the plane, keeping the gray original when the result is all one value."""
+    _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    lit = cv2.countNonZero(bw)
+    if lit == 0 or lit == bw.size:
+        return gray
+    return bw
+
+
+def _decode_first(gray: any, decoder: _ZBarDecoder, scan_edges: bool = True) -> Optional[str]:
+    """Return the first non-empty barcode payload found in the image.
+
+    zbar has no "stop after one code" option, so for linear symbologies the
+    central band of rows is decoded on its own; bars run vertically, so a
+    full-width band still crosses every bar of a centered code. With
+    ``scan_edges`` the top and bottom strips are tried too, which together with
+    the band cover the image once without decoding any row twice.
+    """
+    if not decoder.symbols <= _LINEAR_SYMBOLS:
+        return decoder.decode_first(gray)
+    height = gray.shape[0]
+    top, bottom = height // 4, height - height // 4
+    candidates = [gray[top:bottom]]
+    if scan_edges:
+        candidates += [gray[:top], gray[bottom:]]
+    for image in candidates:
+        if image.shape[0] == 0:
+            continue
+        code = decoder.decode_first(image)
+        if code:
+            return code
     return None
 
 
-def test_camera_access(camera_index: int = 0) -> tuple[bool, str]:
-    """Quick probe for camera readability."""
-    backend = cv2.CAP_AVFOUNDATION if os.name == "posix" else cv2.CAP_ANY
-    capture = cv2.VideoCapture(camera_index, backend)
-    if not capture.isOpened():
-        capture.release()
-        return (
-            False,
-            f"Camera index {camera_index} is unavailable. Try another index or check OS permissions.",
-        )
-    ok, _ = capture.read()
+class _SharpnessGate:
+    """Cheap edge-energy check that skips decoding featureless or motion-blurred frames.
+
+    A frame passes when its Laplacian variance clears both the fixed floor and
+    half of the recent running average, so the gate adapts to scene lighting.
+    """
+
+    def __init__(self, min_sharpness: float, smoothing: float = 0.1) -> None:
+        self._min_sharpness = min_sharpness
+        self._smoothing = smoothing
+        self._average: Optional[float] = None
+
+    def accept(self, gray: any) -> bool:
+        if self._min_sharpness <= 0:
+            return True
+        score = float(cv2.Laplacian(gray, cv2.CV_16S).var())
+        if self._average is None:
+            self._average = score
+        else:
+            self._average += self._smoothing * (score - self._average)
+        return score >= max(self._min_sharpness, 0.5 * self._average)
+
+
+class _ZBarDecoder:
+    """libzbar scanner configured once and reused for every frame of a scan session.
+
+    Unlike ``pyzbar.decode`` this does not rebuild and reconfigure an image
+    scanner per call, points zbar at the ndarray's memory instead of copying it
+    with ``tobytes()``, and stops walking symbols at the first hit. Not thread
+    safe; the scan loop keeps at most one decode in flight.
+    """
+
+    def __init__(self, symbols: Sequence[ZBarSymbol]) -> None:
+        self.symbols = frozenset(symbols)
+        self._scanner = zbar_image_scanner_create()
+        self._image = zbar_image_create()
+        self._data = None
+        for symbol in set(ZBarSymbol).difference(self.symbols):
+            zbar_image_scanner_set_config(self._scanner, symbol, ZBarConfig.CFG_ENABLE, 0)
+        for symbol in self.symbols:
+            zbar_image_scanner_set_config(self._scanner, symbol, ZBarConfig.CFG_ENABLE, 1)
+        zbar_image_set_format(self._image, _Y800)
+
+    def decode_first(self, gray: any) -> Optional[str]:
+        # zbar keeps a raw pointer, so hold a reference until the next frame replaces it.
+        self._data = gray = np.ascontiguousarray(gray)
+        zbar_image_set_size(self._image, gray.shape[1], gray.shape[0])
+        zbar_image_set_data(self._image, gray.ctypes.data_as(c_void_p), gray.nbytes, None)
+        if zbar_scan_image(self._scanner, self._image) <= 0:
+            return None
+
+        symbol = zbar_image_first_symbol(self._image)
+        while symbol:
+            data = string_at(zbar_symbol_get_data(symbol), zbar_symbol_get_data_length(symbol))
+            code = data.decode("utf-8", errors="replace").strip()
+            if code:
+                return code
+            symbol = zbar_symbol_next(symbol)
+        return None
+
+    def close(self) -> None:
+        zbar_image_destroy(self._image)
+        zbar_image_scanner_destroy(self._scanner)
+        self._data = None
+
+
+def _probe_camera(camera_index: int) -> Optional[cv2.VideoCapture]:
+    """Return an open, readable capture for the index, or None."""
+    capture = _open_capture(camera_index)
+    # Probes only need to know a frame arrived, so skip retrieve()'s decode into BGR.
+    if capture.isOpened() and capture.grab():
+        return capture
     capture.release()
-    if not ok:
-        return (
-            False,
-            f"Camera index {camera_index} opened but no frames were readable.",
-        )
+    return None
+
+
+@contextmanager
+def open_first_readable_camera(
+    indices: list[int],
+) -> Iterator[tuple[Optional[int], Optional[cv2.VideoCapture]]]:
+    """Yield (index, capture) for the first readable camera, keeping it open for the caller."""
+    if not indices:
+        yield None, None
+        return
+    # Device opens can take seconds each; probe every index at once (OpenCV releases the GIL).
+    with ThreadPoolExecutor(max_workers=len(indices)) as pool:
+        captures = list(pool.map(_probe_camera, indices))
+
+    selected: tuple[Optional[int], Optional[cv2.VideoCapture]] = (None, None)
+    for idx, capture in zip(indices, captures):
+        if capture is None:
+            continue
+        if selected[1] is None:
+            selected = (idx, capture)
+        else:
+            capture.release()
+    try:
+        yield selected
+    finally:
+        if selected[1] is not None:
+            selected[1].release()
+
+
+def find_first_readable_camera(indices: list[int]) -> Optional[int]:
+    """Return the first camera index that can open and read at least one frame."""
+    with open_first_readable_camera(indices) as (idx, _):
+        return idx
+
+
+def test_camera_access(
+    camera_index: int = 0, capture: Optional[cv2.VideoCapture] = None
+) -> tuple[bool, str]:
+    """Quick probe for camera readability.
+
+    Args:
+        camera_index: OpenCV camera index.
+        capture: Already-open capture to probe instead of opening the device again;
+            the caller keeps ownership.
+    """
+    owns_capture = capture is None
+    if owns_capture:
+        capture = _open_capture(camera_index)
+    try:
+        if not capture.isOpened():
+            return (
+                False,
+                f"Camera index {camera_index} is unavailable. Try another index or check OS permissions.",
+            )
+        if not capture.grab():
+            return (
+                False,
+                f"Camera index {camera_index} opened but no frames were readable.",
+            )
+    finally:
+        if owns_capture:
+            capture.release()
     return True, f"Camera index {camera_index} is accessible."
 
 
@@ -64,49 +418,106 @@ def scan_barcode_from_webcam(
     timeout_seconds: int = 15,
     camera_index: int = 0,
     on_frame: Optional[FrameCallback] = None,
+    decode_scale: float = 0.5,
+    symbols: Sequence[ZBarSymbol] = DEFAULT_SYMBOLS,
+    roi_fraction: Optional[tuple[float, float]] = (0.6, 0.4),
+    capture: Optional[cv2.VideoCapture] = None,
+    fast_gray: bool = True,
+    min_sharpness: float = 60.0,
+    binarize: bool = True,
+    preview_interval: float = 0.1,
 ) -> CameraScanResult:
     """Scan first visible barcode from webcam feed within timeout.
 
     Args:
         timeout_seconds: Maximum scan window.
         camera_index: OpenCV camera index.
-        on_frame: Optional callback receiving BGR frames for live preview.
+        on_frame: Optional callback receiving BGR frames for live preview; it runs on a
+            dedicated preview thread so a slow UI does not stall decoding.
+        decode_scale: Resize factor applied before decoding; the preview keeps full resolution.
+        symbols: Barcode symbologies zbar should look for.
+        roi_fraction: (width, height) share of the centered region to decode; None scans the full frame.
+        capture: Already-open capture (e.g. from a probe) to scan with; the caller keeps ownership.
+        fast_gray: Use the green channel as luminance instead of a full BGR->GRAY conversion.
+        min_sharpness: Laplacian-variance floor below which frames skip decoding; 0 disables.
+        binarize: Otsu-threshold the plane before decoding so zbar skips its own threshold search.
+        preview_interval: Minimum seconds between frames handed to on_frame; frames in between are not copied.
     """
-    backend = cv2.CAP_AVFOUNDATION if os.name == "posix" else cv2.CAP_ANY
-    capture = cv2.VideoCapture(camera_index, backend)
+    owns_capture = capture is None
+    if owns_capture:
+        capture = _open_capture(camera_index)
     if not capture.isOpened():
-        capture.release()
+        if owns_capture:
+            capture.release()
         return CameraScanResult(
             barcode=None,
             error=f"Unable to open camera index {camera_index}.",
             frames_seen=0,
         )
 
+    # Must precede the resolution change: YUYV at 720p saturates USB 2.0 on many UVC webcams.
+    _request_mjpeg(capture)
     capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
     capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
 
-    start = time.time()
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+    deadline = time.monotonic() + timeout_seconds
     found_barcode: Optional[str] = None
     frames_seen = 0
+    seq = 0
+    grabber = _FrameGrabber(capture)
+    grabber.start()
+    # One decode in flight at a time; zbar releases the GIL so it overlaps the next frame's prep.
+    pool = ThreadPoolExecutor(max_workers=1)
+    pending = None
+    decoder = _ZBarDecoder(symbols)
+    gate = _SharpnessGate(min_sharpness)
+    preview = _PreviewWorker(on_frame, preview_interval) if on_frame is not None else None
+
+    decodes = [0]
+
+    def decode_stage(gray: any) -> Optional[str]:
+        decode_start = time.monotonic()
+        # Off-center codes are rarer; sweep the edge strips only every EDGE_SCAN_EVERY decodes.
+        code = _decode_first(gray, decoder, scan_edges=decodes[0] % EDGE_SCAN_EVERY == 0)
+        decodes[0] += 1
+        grabber.stride = max(1, int((time.monotonic() - decode_start) * fps))
+        return code
 
     try:
-        while time.time() - start <= timeout_seconds:
-            ok, frame = capture.read()
-            if not ok:
+        while time.monotonic() <= deadline:
+            seq, frame = grabber.latest(seq, timeout=0.1)
+            if frame is None:
+                if grabber.failed:
+                    break
                 continue
+
             frames_seen += 1
 
-            if on_frame is not None:
-                on_frame(frame)
+            if preview is not None:
+                preview.submit(frame)
 
-            decoded = decode(frame)
-            if decoded:
-                code = decoded[0].data.decode("utf-8").strip()
-                if code:
-                    found_barcode = code
+            gray = _prepare_decode_image(frame, roi_fraction, decode_scale, fast_gray)
+            sharp = gate.accept(gray)
+            if pending is not None and (sharp or pending.done()):
+                found_barcode = pending.result()
+                pending = None
+                if found_barcode:
                     break
+            if sharp:
+                pending = pool.submit(decode_stage, _binarize(gray) if binarize else gray)
+
+        if pending is not None and not found_barcode:
+            found_barcode = pending.result()
     finally:
-        capture.release()
+        if preview is not None:
+            preview.close()
+        pool.shutdown()
+        decoder.close()
+        grabber.stop()
+        if owns_capture:
+            capture.release()
 
     if found_barcode:
         return CameraScanResult(barcode=found_barcode, error=None, frames_seen=frames_seen)
@@ -116,6 +527,12 @@ def scan_barcode_from_webcam(
             error="Camera opened but no frames captured. Check camera permission for the terminal app.",
             frames_seen=0,
         )
+    if grabber.failed:
+        return CameraScanResult(
+            barcode=None,
+            error="Camera stopped delivering frames during the scan.",
+            frames_seen=frames_seen,
+        )
     return CameraScanResult(
         barcode=None,
         error=f"No barcode detected within {timeout_seconds}s.",
@@ -6,22 +6,42 @@ This module is intentionally framework-agnostic so both FastAPI and scripts can
 from __future__ import annotations
 
 import sqlite3
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from scoring import IMPACT_TO_POINTS
 
 DB_PATH = Path(__file__).resolve().parent / "ecoscan.db"
 
+_local = threading.local()
+
 
 def get_connection() -> sqlite3.Connection:
-    """Create a SQLite connection with dictionary-like rows."""
-    connection = sqlite3.connect(DB_PATH)
-    connection.row_factory = sqlite3.Row
+    """Return this thread's cached autocommit SQLite connection with dictionary-like rows."""
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        connection = sqlite3.connect(
+            DB_PATH,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=128,
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        connection.execute("PRAGMA mmap_size=268435456")
+        connection.execute("PRAGMA cache_size=-20000")
+        _local.connection = connection
     return connection
 
 
 def init_db() -> None:
     """Create and migrate the scans table for MVP analytics needs."""
     with get_connection() as connection:
+        # Autocommit connection: group the schema changes in one transaction, committed on exit.
+        connection.execute("BEGIN")
         connection.execute(
             """
             CREATE TABLE IF NOT EXISTS scans (
@@ -32,7 +52,10 @@ def init_db() -> None:
                 impact_score TEXT,
                 disposal_type TEXT,
                 co2_estimate REAL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                impact_points INTEGER,
+                timestamp_display TEXT
+                    GENERATED ALWAYS AS (COALESCE(strftime('%Y-%m-%d %H:%M', timestamp), timestamp)) VIRTUAL
             )
             """
         )
@@ -40,12 +63,60 @@ def init_db() -> None:
         # Lightweight migration to support existing local DB files created by older versions.
         columns = {
             row["name"]
-            for row in connection.execute("PRAGMA table_info(scans)").fetchall()
+            for row in connection.execute("PRAGMA table_xinfo(scans)").fetchall()
         }
         if "co2_estimate" not in columns:
             connection.execute("ALTER TABLE scans ADD COLUMN co2_estimate REAL DEFAULT 0")
+        if "impact_points" not in columns:
+            # Points are denormalized at insert time so score reads are a plain SUM.
+            connection.execute("ALTER TABLE scans ADD COLUMN impact_points INTEGER")
+            connection.execute(
+                """
+                UPDATE scans
+                SET impact_points = CASE impact_score WHEN 'Green' THEN 3 WHEN 'Yellow' THEN 2 WHEN 'Red' THEN 1 ELSE 2 END
+                WHERE impact_points IS NULL
+                """
+            )
+        if "timestamp_display" not in columns:
+            # Formatted by SQLite on read so renderers do not parse timestamps in Python.
+            connection.execute(
+                """
+                ALTER TABLE scans ADD COLUMN timestamp_display TEXT
+                    GENERATED ALWAYS AS (COALESCE(strftime('%Y-%m-%d %H:%M', timestamp), timestamp)) VIRTUAL
+                """
+            )
+
+        # Analytics filter on timestamp and group by impact_score or date(timestamp).
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_scans_ts ON scans(timestamp DESC)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_scans_impact ON scans(impact_score)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_scans_day ON scans(date(timestamp))")
+
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS product_cache (
+                barcode TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                payload BLOB,
+                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
 
-        connection.commit()
+    connection.execute("ANALYZE")
+
+
+_INSERT_SCAN_SQL = """
+    INSERT INTO scans (
+        product_name,
+        barcode,
+        city,
+        impact_score,
+        disposal_type,
+        co2_estimate,
+        impact_points
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
 
 
 def insert_scan(
@@ -59,22 +130,83 @@ def insert_scan(
     """Insert scan row and return created id."""
     with get_connection() as connection:
         cursor = connection.execute(
-            """
-            INSERT INTO scans (
+            _INSERT_SCAN_SQL,
+            (
                 product_name,
                 barcode,
                 city,
                 impact_score,
                 disposal_type,
-                co2_estimate
-            ) VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (product_name, barcode, city, impact_score, disposal_type, co2_estimate),
+                co2_estimate,
+                IMPACT_TO_POINTS.get(impact_score, 2),
+            ),
         )
-        connection.commit()
         return int(cursor.lastrowid)
 
 
+def insert_scan_returning(
+    product_name: str,
+    barcode: str,
+    city: str,
+    impact_score: str,
+    disposal_type: str,
+    co2_estimate: float,
+) -> Dict:
+    """Insert scan row and return it as stored, in one statement (SQLite 3.35+ RETURNING)."""
+    with get_connection() as connection:
+        rows = connection.execute(
+            _INSERT_SCAN_SQL
+            + "RETURNING id, product_name, barcode, city, impact_score, disposal_type, co2_estimate, timestamp",
+            (
+                product_name,
+                barcode,
+                city,
+                impact_score,
+                disposal_type,
+                co2_estimate,
+                IMPACT_TO_POINTS.get(impact_score, 2),
+            ),
+        ).fetchall()
+    # fetchall() steps the statement to completion so the autocommit write is finalized.
+    return dict(rows[0])
+
+
+def get_cached_product(barcode: str) -> Optional[Dict]:
+    """Fetch the cached Open Food Facts response and its validators for a barcode."""
+    with get_connection() as connection:
+        row = connection.execute(
+            """
+            SELECT barcode, etag, last_modified, payload, fetched_at
+            FROM product_cache
+            WHERE barcode = ?
+            """,
+            (barcode,),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def store_cached_product(
+    barcode: str,
+    etag: Optional[str],
+    last_modified: Optional[str],
+    payload: bytes,
+) -> None:
+    """Insert or replace the cached Open Food Facts response for a barcode."""
+    with get_connection() as connection:
+        connection.execute(
+            """
+            INSERT INTO product_cache (barcode, etag, last_modified, payload, fetched_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(barcode) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                payload = excluded.payload,
+                fetched_at = excluded.fetched_at
+            """,
+            (barcode, etag, last_modified, payload),
+        )
+
+
 def get_scan_by_id(scan_id: int) -> Optional[Dict]:
     """Fetch one scan row by id."""
     with get_connection() as connection:
@@ -89,143 +221,248 @@ def get_scan_by_id(scan_id: int) -> Optional[Dict]:
     return dict(row) if row else None
 
 
-def get_scan_history(limit: int = 100) -> List[Dict]:
-    """Fetch most-recent scans."""
+def get_scan_history_raw(limit: int = 100) -> List[sqlite3.Row]:
+    """Fetch most-recent scans as sqlite3.Row objects, skipping dict conversion."""
     with get_connection() as connection:
-        rows = connection.execute(
+        return connection.execute(
             """
-            SELECT id, product_name, barcode, city, impact_score, disposal_type, co2_estimate, timestamp
+            SELECT
+                id, product_name, barcode, city, impact_score, disposal_type, co2_estimate, timestamp,
+                timestamp_display
             FROM scans
             ORDER BY timestamp DESC, id DESC
             LIMIT ?
             """,
             (limit,),
         ).fetchall()
+
+
+def get_scan_history(limit: int = 100) -> List[Dict]:
+    """Fetch most-recent scans."""
+    return [dict(row) for row in get_scan_history_raw(limit)]
+
+
+def get_max_scan_id() -> int:
+    """Return the newest scan id, or 0 when there are no scans."""
+    with get_connection() as connection:
+        row = connection.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM scans").fetchone()
+    return int(row["max_id"] if row else 0)
+
+
+def _live_environmental_score(connection: sqlite3.Connection, days: int) -> int:
+    row = connection.execute(
+        """
+        SELECT COALESCE(SUM(impact_points), 0) AS points
+        FROM scans
+        WHERE timestamp >= datetime('now', ?)
+        """,
+        (f"-{days} days",),
+    ).fetchone()
+    return int(row["points"])
+
+
+def _total_scans(connection: sqlite3.Connection) -> int:
+    row = connection.execute("SELECT COUNT(*) AS total FROM scans").fetchone()
+    return int(row["total"] if row else 0)
+
+
+def _total_co2(connection: sqlite3.Connection) -> float:
+    row = connection.execute(
+        "SELECT COALESCE(SUM(co2_estimate), 0) AS total_co2 FROM scans"
+    ).fetchone()
+    return float(row["total_co2"] if row else 0.0)
+
+
+def _weekly_co2_series(connection: sqlite3.Connection, days: int) -> List[Dict]:
+    rows = connection.execute(
+        """
+        SELECT date(timestamp) AS day, ROUND(COALESCE(SUM(co2_estimate), 0), 2) AS co2
+        FROM scans
+        WHERE timestamp >= datetime('now', ?)
+        GROUP BY date(timestamp)
+        ORDER BY day ASC
+        """,
+        (f"-{days - 1} days",),
+    ).fetchall()
     return [dict(row) for row in rows]
 
 
+def _impact_distribution(connection: sqlite3.Connection) -> List[Dict]:
+    rows = connection.execute(
+        """
+        SELECT impact_score, COUNT(*) AS count
+        FROM scans
+        GROUP BY impact_score
+        ORDER BY count DESC
+        """
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _trend_line(connection: sqlite3.Connection, days: int) -> List[Dict]:
+    rows = connection.execute(
+        """
+        SELECT
+            date(timestamp) AS day,
+            ROUND(COALESCE(SUM(co2_estimate), 0), 2) AS co2,
+            COUNT(*) AS scans
+        FROM scans
+        WHERE timestamp >= datetime('now', ?)
+        GROUP BY date(timestamp)
+        ORDER BY day ASC
+        """,
+        (f"-{days - 1} days",),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _current_streak(connection: sqlite3.Connection) -> int:
+    from datetime import date
+
+    # Walk back from today while each day has a scan; the last generated row's n is the streak.
+    row = connection.execute(
+        """
+        WITH RECURSIVE streak(day, n) AS (
+            SELECT ?, 0
+            UNION ALL
+            SELECT date(day, '-1 day'), n + 1
+            FROM streak
+            WHERE EXISTS (SELECT 1 FROM scans WHERE date(timestamp) = streak.day)
+        )
+        SELECT MAX(n) AS streak FROM streak
+        """,
+        (date.today().isoformat(),),
+    ).fetchone()
+    return int(row["streak"] if row else 0)
+
+
 def get_live_environmental_score(days: int = 7) -> int:
     """Compute color-based points for recent scans."""
-    mapping = {"Green": 3, "Yellow": 2, "Red": 1}
     with get_connection() as connection:
-        rows = connection.execute(
-            """
-            SELECT impact_score
-            FROM scans
-            WHERE timestamp >= datetime('now', ?)
-            """,
-            (f"-{days} days",),
-        ).fetchall()
-    return sum(mapping.get(row["impact_score"], 2) for row in rows)
+        return _live_environmental_score(connection, days)
 
 
 def get_total_scans() -> int:
     with get_connection() as connection:
-        row = connection.execute("SELECT COUNT(*) AS total FROM scans").fetchone()
-    return int(row["total"] if row else 0)
+        return _total_scans(connection)
 
 
 def get_total_co2() -> float:
     with get_connection() as connection:
-        row = connection.execute(
-            "SELECT COALESCE(SUM(co2_estimate), 0) AS total_co2 FROM scans"
-        ).fetchone()
-    return float(row["total_co2"] if row else 0.0)
+        return _total_co2(connection)
 
 
-def get_weekly_co2_series() -> List[Dict]:
+def get_weekly_co2_series(days: int = 7) -> List[Dict]:
     """Return last 7 days of CO2 totals."""
     with get_connection() as connection:
-        rows = connection.execute(
-            """
-            SELECT date(timestamp) AS day, ROUND(COALESCE(SUM(co2_estimate), 0), 2) AS co2
-            FROM scans
-            WHERE timestamp >= datetime('now', '-6 days')
-            GROUP BY date(timestamp)
-            ORDER BY day ASC
-            """
-        ).fetchall()
-    return [dict(row) for row in rows]
+        return _weekly_co2_series(connection, days)
 
 
 def get_impact_distribution() -> List[Dict]:
     """Return aggregate counts by impact color."""
     with get_connection() as connection:
-        rows = connection.execute(
-            """
-            SELECT impact_score, COUNT(*) AS count
-            FROM scans
-            GROUP BY impact_score
-            ORDER BY count DESC
-            """
-        ).fetchall()
-    return [dict(row) for row in rows]
+        return _impact_distribution(connection)
 
 
 def get_trend_line(days: int = 30) -> List[Dict]:
     """Return 30-day trend of daily CO2 and scan volume."""
     with get_connection() as connection:
-        rows = connection.execute(
-            """
-            SELECT
-                date(timestamp) AS day,
-                ROUND(COALESCE(SUM(co2_estimate), 0), 2) AS co2,
-                COUNT(*) AS scans
-            FROM scans
-            WHERE timestamp >= datetime('now', ?)
-            GROUP BY date(timestamp)
-            ORDER BY day ASC
-            """,
-            (f"-{days - 1} days",),
-        ).fetchall()
-    return [dict(row) for row in rows]
+        return _trend_line(connection, days)
 
 
 def get_current_streak() -> int:
     """Calculate consecutive day streak ending today."""
     with get_connection() as connection:
-        rows = connection.execute(
-            """
-            SELECT DISTINCT date(timestamp) AS day
-            FROM scans
-            ORDER BY day DESC
-            """
-        ).fetchall()
-
-    days = [row["day"] for row in rows]
-    if not days:
-        return 0
-
-    from datetime import date, timedelta
-
-    day_set = set(days)
-    cursor = date.today()
-    streak = 0
+        return _current_streak(connection)
+
+
+def _scalar_totals(connection: sqlite3.Connection, score_days: int) -> Tuple[int, float, int]:
+    """(total scans, total CO2, recent impact points) from one pass over scans."""
+    row = connection.execute(
+        """
+        SELECT
+            COUNT(*) AS total,
+            COALESCE(SUM(co2_estimate), 0) AS total_co2,
+            COALESCE(SUM(CASE WHEN timestamp >= datetime('now', ?) THEN impact_points END), 0) AS points
+        FROM scans
+        """,
+        (f"-{score_days} days",),
+    ).fetchone()
+    return int(row["total"]), float(row["total_co2"]), int(row["points"])
+
+
+def get_dashboard_bundle(days: int = 7) -> Dict:
+    """Return the headline dashboard metrics from a single connection."""
+    with get_connection() as connection:
+        total_scans, total_co2, live_score = _scalar_totals(connection, days)
+        return {
+            "live_score": live_score,
+            "streak": _current_streak(connection),
+            "total_co2": total_co2,
+            "total_scans": total_scans,
+        }
 
-    while cursor.isoformat() in day_set:
-        streak += 1
-        cursor -= timedelta(days=1)
 
-    return streak
+def get_analytics_bundle(days_week: int = 7, days_trend: int = 30, score_days: int = 7) -> Dict:
+    """Return every analytics aggregate from a single connection."""
+    with get_connection() as connection:
+        total_scans, total_co2, environmental_score = _scalar_totals(connection, score_days)
+        return {
+            "weekly": _weekly_co2_series(connection, days_week),
+            "trend": _trend_line(connection, days_trend),
+            "dist": _impact_distribution(connection),
+            "totals": {
+                "total_scans": total_scans,
+                "total_co2": total_co2,
+                "streak": _current_streak(connection),
+                "environmental_score": environmental_score,
+            },
+        }
 
 
-def get_monthly_scans(year: int, month: int) -> List[Dict]:
-    """Return scans for the selected month."""
+def _month_bounds(year: int, month: int) -> Tuple[str, str]:
     start = f"{year:04d}-{month:02d}-01"
     if month == 12:
         next_month = f"{year + 1:04d}-01-01"
     else:
         next_month = f"{year:04d}-{month + 1:02d}-01"
+    return start, next_month
 
+
+_MONTHLY_SCANS_SQL = """
+    SELECT id, product_name, barcode, city, impact_score, disposal_type, co2_estimate, timestamp
+    FROM scans
+    WHERE timestamp >= ? AND timestamp < ?
+    ORDER BY timestamp ASC
+"""
+
+
+def get_monthly_scans_tuples(year: int, month: int) -> List[tuple]:
+    """Return scans for the selected month as plain tuples in column order, ready for csv.writerows."""
     with get_connection() as connection:
-        rows = connection.execute(
-            """
-            SELECT id, product_name, barcode, city, impact_score, disposal_type, co2_estimate, timestamp
-            FROM scans
-            WHERE timestamp >= ? AND timestamp < ?
-            ORDER BY timestamp ASC
-            """,
-            (start, next_month),
-        ).fetchall()
-    return [dict(row) for row in rows]
+        cursor = connection.cursor()
+        cursor.row_factory = None
+        return cursor.execute(_MONTHLY_SCANS_SQL, _month_bounds(year, month)).fetchall()
+
+
+def iter_monthly_scans_tuples(year: int, month: int, batch_size: int = 500) -> Iterator[tuple]:
+    """Yield the month's scans as tuples straight off the cursor, ``batch_size`` rows at a time.
 
+    Uses its own connection so a streaming consumer may advance it from any thread.
+    """
+    connection = sqlite3.connect(DB_PATH, check_same_thread=False)
+    try:
+        cursor = connection.execute(_MONTHLY_SCANS_SQL, _month_bounds(year, month))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        connection.close()
+
+
+def get_monthly_scans(year: int, month: int) -> List[Dict]:
+    """Return scans for the selected month."""
+    columns = ("id", "product_name", "barcode", "city", "impact_score", "disposal_type", "co2_estimate", "timestamp")
+    return [dict(zip(columns, row)) for row in get_monthly_scans_tuples(year, month)]
@@ -8,33 +8,43 @@ from __future__ import annotations
 
 import csv
 import datetime as dt
+import hashlib
 import io
 import math
+import os
+import platform
+import shelve
 import threading
+import time
 import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from tkinter import filedialog, messagebox, ttk
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from camera import find_first_readable_camera, scan_barcode_from_webcam
+from camera import open_first_readable_camera, scan_barcode_from_webcam
 from database import (
-    get_current_streak,
-    get_impact_distribution,
-    get_live_environmental_score,
-    get_monthly_scans,
-    get_scan_history,
-    get_total_co2,
-    get_total_scans,
-    get_trend_line,
-    get_weekly_co2_series,
+    get_analytics_bundle,
+    get_dashboard_bundle,
+    get_max_scan_id,
+    get_monthly_scans_tuples,
+    get_scan_history_raw,
     init_db,
     insert_scan,
 )
 from disposal import SUPPORTED_CITIES, get_disposal_instruction
 from scoring import IMPACT_TO_LABEL, estimate_co2, score_product, suggest_alternative
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional faster JSON decoding
+    orjson = None
+
 try:
     from PIL import Image, ImageTk
 except ImportError:  # pragma: no cover - optional rendering support
@@ -42,7 +52,21 @@ except ImportError:  # pragma: no cover - optional rendering support
     ImageTk = None
 
 
-OPEN_FOOD_FACTS_URL = "https://world.openfoodfacts.org/api/v2/product/{barcode}.json"
+# Only request the fields read by parse_product_result and score_product.
+OPEN_FOOD_FACTS_FIELDS = (
+    "product_name",
+    "product_name_en",
+    "image_url",
+    "packaging_tags",
+    "packaging",
+    "categories_tags",
+    "labels_tags",
+    "ingredients_text",
+    "nova_group",
+)
+OPEN_FOOD_FACTS_URL = (
+    "https://world.openfoodfacts.org/api/v2/product/{barcode}.json?fields=" + ",".join(OPEN_FOOD_FACTS_FIELDS)
+)
 APP_BG = "#0e1117"
 CARD_BG = "#171b24"
 CARD_BG_ALT = "#131923"
@@ -51,13 +75,104 @@ TEXT_MUTED = "#8f9bb2"
 ACCENT = "#43f2a2"
 ACCENT_BLUE = "#66b6ff"
 IMPACT_COLORS = {"Green": "#3dffb6", "Yellow": "#ffe066", "Red": "#ff5d73"}
+CACHE_DIR = Path.home() / ".ecoscan"
+PRODUCT_CACHE_PATH = CACHE_DIR / "product_cache"
+PRODUCT_CACHE_TTL_SECONDS = 24 * 60 * 60
+RESULT_CACHE_MAX_ENTRIES = 256
+IMAGE_CACHE_DIR = CACHE_DIR / "img_cache"
+IMAGE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+CSV_COLUMNS = (
+    "id",
+    "product_name",
+    "barcode",
+    "city",
+    "impact_score",
+    "disposal_type",
+    "co2_estimate",
+    "timestamp",
+)
+
+_product_cache_lock = threading.Lock()
+# Each thumbnail load runs on its own thread; one eviction pass at a time keeps their unlinks apart.
+_image_cache_lock = threading.Lock()
+# One keep-alive session for product and image requests so TLS setup is paid once.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_SESSION.headers.update({"Accept-Encoding": "gzip", "User-Agent": "EcoScanAI/1.0"})
 
 
 def impact_color(score: str) -> str:
     return IMPACT_COLORS.get(score, ACCENT)
 
 
+@lru_cache(maxsize=128)
+def _hex_to_rgb(value: str) -> tuple[int, int, int]:
+    value = value.lstrip("#")
+    return tuple(int(value[i : i + 2], 16) for i in (0, 2, 4))
+
+
+def _read_cached_product(barcode: str) -> Optional[Dict[str, Any]]:
+    """Return the on-disk product for a barcode if it is younger than the TTL."""
+    try:
+        with _product_cache_lock, shelve.open(str(PRODUCT_CACHE_PATH)) as store:
+            entry = store.get(barcode)
+    except Exception:  # noqa: BLE001
+        return None
+    if not entry or time.time() - entry["fetched_at"] > PRODUCT_CACHE_TTL_SECONDS:
+        return None
+    return entry["product"]
+
+
+def _store_cached_product(barcode: str, product: Dict[str, Any]) -> None:
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with _product_cache_lock, shelve.open(str(PRODUCT_CACHE_PATH)) as store:
+            store[barcode] = {"fetched_at": time.time(), "product": product}
+    except Exception:  # noqa: BLE001
+        pass
+
+
+def _fetch_product_cached(barcode: str) -> Dict[str, Any]:
+    """Fetch a product from Open Food Facts, cached on disk until the TTL lapses."""
+    cached = _read_cached_product(barcode)
+    if cached is not None:
+        return cached
+
+    url = OPEN_FOOD_FACTS_URL.format(barcode=barcode)
+    response = _SESSION.get(url, timeout=15)
+    response.raise_for_status()
+    payload = orjson.loads(response.content) if orjson is not None else response.json()
+    if payload.get("status") != 1 or not payload.get("product"):
+        raise ValueError("Product not found in Open Food Facts.")
+    _store_cached_product(barcode, payload["product"])
+    return payload["product"]
+
+
+def _image_cache_path(image_url: str) -> Path:
+    return IMAGE_CACHE_DIR / f"{hashlib.sha1(image_url.encode()).hexdigest()}.png"
+
+
+def _evict_image_cache() -> None:
+    """Drop least-recently-used thumbnails once the cache grows past its budget."""
+    with _image_cache_lock:
+        entries = []
+        for entry in IMAGE_CACHE_DIR.glob("*.png"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= IMAGE_CACHE_MAX_BYTES:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+
 class EcoScanDesktopApp(tk.Tk):
+    HISTORY_TAGS = {"Green": "impact_green", "Yellow": "impact_yellow", "Red": "impact_red"}
+
     def __init__(self) -> None:
         super().__init__()
         self.title("EcoScan AI - Desktop")
@@ -71,20 +186,37 @@ class EcoScanDesktopApp(tk.Tk):
         self.latest_trend_data: list[Dict[str, Any]] = []
         self.pulse_phase = 0
         self.badge_base_color = "#1f2735"
+        self._pulse_palette: list[str] = []
         self.badge_animation_job: Optional[str] = None
+        self._weekly_redraw_job: Optional[str] = None
+        self._trend_redraw_job: Optional[str] = None
+        self._last_weekly_size: Optional[tuple[int, int]] = None
+        self._last_trend_size: Optional[tuple[int, int]] = None
+        # Alpha changes are cheap on macOS but force full recomposition on most X11 window managers.
+        self._enable_fade = platform.system() == "Darwin"
+        # Scoring and disposal lookups are deterministic, so results are reusable per (barcode, city).
+        # LRU-bounded; an expired entry refetches through the TTL'd disk cache, so stale data ages out.
+        self._result_cache: "OrderedDict[tuple[str, str], tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._result_cache_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=4)
+        # Only touched from the Tk thread, so no lock is needed.
+        self._inflight: set[tuple[str, str]] = set()
+        self._last_history_max_id: Optional[int] = None
 
         init_db()
+        self._set_badge_base_color(self.badge_base_color)
         self._build_styles()
         self._build_ui()
         self._start_badge_pulse()
+        self.bind("<Unmap>", self._on_window_unmap)
+        self.bind("<Map>", self._on_window_map)
         self.refresh_dashboard()
         self.refresh_history()
         self.refresh_analytics()
 
     @staticmethod
     def _hex_to_rgb(value: str) -> tuple[int, int, int]:
-        value = value.lstrip("#")
-        return tuple(int(value[i : i + 2], 16) for i in (0, 2, 4))
+        return _hex_to_rgb(value)
 
     @staticmethod
     def _rgb_to_hex(rgb: tuple[int, int, int]) -> str:
@@ -102,6 +234,9 @@ class EcoScanDesktopApp(tk.Tk):
 
     def _build_styles(self) -> None:
         style = ttk.Style(self)
+        # Styles live in the Tcl interpreter, so skip only if this one is already configured.
+        if style.theme_use() == "clam" and style.lookup("Accent.TButton", "background") == ACCENT:
+            return
         style.theme_use("clam")
 
         style.configure("TFrame", background=APP_BG)
@@ -182,7 +317,7 @@ class EcoScanDesktopApp(tk.Tk):
         frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 8))
         inner = ttk.Frame(frame, style="Card.TFrame", padding=10)
         inner.pack(fill=tk.BOTH, expand=True)
-        value = ttk.Label(inner, text="0", style="MetricValue.TLabel")
+        value = ttk.Label(inner, text="…", style="MetricValue.TLabel")
         value.pack(anchor="w")
         ttk.Label(inner, text=label, style="MetricLabel.TLabel").pack(anchor="w")
         return value
@@ -203,7 +338,7 @@ class EcoScanDesktopApp(tk.Tk):
         self.city_var = tk.StringVar(value=SUPPORTED_CITIES[0])
         self.city_box = ttk.Combobox(
             controls,
-            values=list(SUPPORTED_CITIES),
+            values=SUPPORTED_CITIES,
             textvariable=self.city_var,
             state="readonly",
             width=24,
@@ -335,8 +470,31 @@ class EcoScanDesktopApp(tk.Tk):
         self.weekly_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 5))
         self.trend_canvas = tk.Canvas(chart_wrap, bg="#10141d", highlightthickness=0)
         self.trend_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(5, 0))
-        self.weekly_canvas.bind("<Configure>", lambda _: self._draw_weekly_bars(self.latest_weekly_data))
-        self.trend_canvas.bind("<Configure>", lambda _: self._draw_trend_line(self.latest_trend_data))
+        self.weekly_canvas.bind("<Configure>", self._on_weekly_configure)
+        self.trend_canvas.bind("<Configure>", self._on_trend_configure)
+
+    def _on_weekly_configure(self, event: tk.Event) -> None:
+        """Coalesce resize events into a single redraw once the drag settles."""
+        if (event.width, event.height) == self._last_weekly_size:
+            return
+        if self._weekly_redraw_job:
+            self.after_cancel(self._weekly_redraw_job)
+        self._weekly_redraw_job = self.after(50, self._redraw_weekly)
+
+    def _redraw_weekly(self) -> None:
+        self._weekly_redraw_job = None
+        self._draw_weekly_bars(self.latest_weekly_data)
+
+    def _on_trend_configure(self, event: tk.Event) -> None:
+        if (event.width, event.height) == self._last_trend_size:
+            return
+        if self._trend_redraw_job:
+            self.after_cancel(self._trend_redraw_job)
+        self._trend_redraw_job = self.after(50, self._redraw_trend)
+
+    def _redraw_trend(self) -> None:
+        self._trend_redraw_job = None
+        self._draw_trend_line(self.latest_trend_data)
 
     def _build_history_tab(self) -> None:
         wrap = ttk.Frame(self.history_tab, style="Card.TFrame", padding=10)
@@ -369,28 +527,49 @@ class EcoScanDesktopApp(tk.Tk):
         self.history_tree.tag_configure("impact_yellow", foreground="#ffe066")
         self.history_tree.tag_configure("impact_red", foreground="#ff7d8e")
 
-        scroll = ttk.Scrollbar(wrap, orient=tk.VERTICAL, command=self.history_tree.yview)
-        self.history_tree.configure(yscrollcommand=scroll.set)
+        self.history_scroll = ttk.Scrollbar(wrap, orient=tk.VERTICAL, command=self.history_tree.yview)
+        self.history_tree.configure(yscrollcommand=self.history_scroll.set)
         self.history_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.history_scroll.pack(side=tk.RIGHT, fill=tk.Y)
 
     def _start_badge_pulse(self) -> None:
         """Continuously pulse the impact badge glow."""
-        base = self.badge_base_color
-        peak = "#ffffff"
-        t = (math.sin(self.pulse_phase) + 1.0) / 2.0
-        t = 0.12 + (t * 0.28)
-        shade = self._mix(base, peak, t)
-        self.impact_badge.configure(bg=shade)
+        if self.notebook.index(self.notebook.select()) != 0 or self.state() == "iconic":
+            # Badge is offscreen; poll slowly instead of repainting it.
+            self.badge_animation_job = self.after(400, self._start_badge_pulse)
+            return
+        idx = int(((math.sin(self.pulse_phase) + 1.0) / 2.0) * (len(self._pulse_palette) - 1))
+        self.impact_badge.configure(bg=self._pulse_palette[idx])
         self.pulse_phase += 0.18
         self.badge_animation_job = self.after(80, self._start_badge_pulse)
 
+    def _set_badge_base_color(self, color: str) -> None:
+        """Precompute the pulse shades so the animation loop only indexes a list."""
+        self.badge_base_color = color
+        self._pulse_palette = [self._mix(color, "#ffffff", 0.12 + (i / 63) * 0.28) for i in range(64)]
+
+    def destroy(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        super().destroy()
+
+    def _on_window_unmap(self, event: tk.Event) -> None:
+        # The root binding also fires for every child widget; only react to the window itself.
+        if event.widget is not self or not self.badge_animation_job:
+            return
+        self.after_cancel(self.badge_animation_job)
+        self.badge_animation_job = None
+
+    def _on_window_map(self, event: tk.Event) -> None:
+        if event.widget is self and not self.badge_animation_job:
+            self._start_badge_pulse()
+
     def _window_fade_transition(self) -> None:
         """Subtle fade on tab switch for smoother transitions."""
+        if not self._enable_fade:
+            return
         try:
-            levels = [1.0, 0.985, 0.97, 0.985, 1.0]
-            for i, alpha in enumerate(levels):
-                self.after(i * 24, lambda a=alpha: self.attributes("-alpha", a))
+            self.attributes("-alpha", 0.97)
+            self.after(60, lambda: self.attributes("-alpha", 1.0))
         except tk.TclError:
             return
 
@@ -406,13 +585,7 @@ class EcoScanDesktopApp(tk.Tk):
         self.result_text.configure(state=tk.DISABLED)
 
     def fetch_product(self, barcode: str) -> Dict[str, Any]:
-        url = OPEN_FOOD_FACTS_URL.format(barcode=barcode)
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        payload = response.json()
-        if payload.get("status") != 1 or not payload.get("product"):
-            raise ValueError("Product not found in Open Food Facts.")
-        return payload["product"]
+        return _fetch_product_cached(barcode)
 
     def parse_product_result(self, barcode: str, city: str, product: Dict[str, Any]) -> Dict[str, Any]:
         product_name = product.get("product_name") or product.get("product_name_en") or "Unknown Product"
@@ -449,17 +622,40 @@ class EcoScanDesktopApp(tk.Tk):
             messagebox.showwarning("Missing Barcode", "Enter or scan a barcode first.")
             return
 
+        key = (barcode, city)
+        if key in self._inflight:
+            return
+        self._inflight.add(key)
         self.scan_status.configure(text="Analyzing product...")
 
-        def worker() -> None:
-            try:
-                product = self.fetch_product(barcode)
-                result = self.parse_product_result(barcode, city, product)
-                self.after(0, lambda: self._on_analysis_success(result))
-            except Exception as exc:  # noqa: BLE001
-                self.after(0, lambda: self._on_analysis_error(str(exc)))
-
-        threading.Thread(target=worker, daemon=True).start()
+        future = self._pool.submit(self._analyze, barcode, city)
+        future.add_done_callback(lambda f: self.after(0, lambda: self._handle_analysis(f, key)))
+
+    def _analyze(self, barcode: str, city: str) -> Dict[str, Any]:
+        key = (barcode, city)
+        # Runs on pool threads, so cache access goes through the lock.
+        with self._result_cache_lock:
+            entry = self._result_cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= PRODUCT_CACHE_TTL_SECONDS:
+                self._result_cache.move_to_end(key)
+                return entry[1]
+        product = self.fetch_product(barcode)
+        result = self.parse_product_result(barcode, city, product)
+        with self._result_cache_lock:
+            self._result_cache[key] = (time.monotonic(), result)
+            self._result_cache.move_to_end(key)
+            while len(self._result_cache) > RESULT_CACHE_MAX_ENTRIES:
+                self._result_cache.popitem(last=False)
+        return result
+
+    def _handle_analysis(self, future: Future, key: tuple[str, str]) -> None:
+        self._inflight.discard(key)
+        try:
+            result = future.result()
+        except Exception as exc:  # noqa: BLE001
+            self._on_analysis_error(str(exc))
+            return
+        self._on_analysis_success(result)
 
     def _on_analysis_success(self, result: Dict[str, Any]) -> None:
         self.latest_result = result
@@ -467,7 +663,7 @@ class EcoScanDesktopApp(tk.Tk):
         self.header_chip.configure(text=f"{result['impact_score'].upper()} SIGNAL", fg=impact_color(result["impact_score"]))
         self.render_result(result)
         self.render_product_image(result.get("product_image"))
-        self.badge_base_color = impact_color(result["impact_score"])
+        self._set_badge_base_color(impact_color(result["impact_score"]))
         self.product_title.configure(text=result["product_name"])
         self.impact_badge.configure(
             text=f"{result['impact_score']} • {result['impact_label']}",
@@ -503,16 +699,34 @@ class EcoScanDesktopApp(tk.Tk):
             return
 
         def worker() -> None:
+            stored = False
             try:
-                response = requests.get(image_url, timeout=12)
-                response.raise_for_status()
-                image_data = response.content
-                pil_image = Image.open(io.BytesIO(image_data)).convert("RGB")
-                pil_image.thumbnail((460, 260))
+                cache_path = _image_cache_path(image_url)
+                if cache_path.exists():
+                    pil_image = Image.open(cache_path)
+                    os.utime(cache_path)
+                else:
+                    response = _SESSION.get(image_url, timeout=12)
+                    response.raise_for_status()
+                    image_data = response.content
+                    pil_image = Image.open(io.BytesIO(image_data))
+                    # JPEGs decode straight at a reduced DCT scale; other formats ignore this.
+                    pil_image.draft("RGB", (460, 260))
+                    pil_image = pil_image.convert("RGB")
+                    pil_image.thumbnail((460, 260), Image.Resampling.BILINEAR)
+                    IMAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                    pil_image.save(cache_path, "PNG", optimize=True)
+                    stored = True
                 tk_image = ImageTk.PhotoImage(pil_image)
                 self.after(0, lambda: self._set_product_image(tk_image))
             except Exception:  # noqa: BLE001
                 self.after(0, lambda: self.image_label.configure(image="", text="Image unavailable.", fg=TEXT_MUTED))
+            # Outside the display try, so an eviction error cannot replace a thumbnail that loaded.
+            if stored:
+                try:
+                    _evict_image_cache()
+                except OSError:
+                    pass
 
         threading.Thread(target=worker, daemon=True).start()
 
@@ -548,8 +762,13 @@ class EcoScanDesktopApp(tk.Tk):
 
         def worker() -> None:
             preferred = [1, 2, 3, 4, 5]
-            selected = find_first_readable_camera(preferred) or self.camera_idx_var.get()
-            scan_result = scan_barcode_from_webcam(timeout_seconds=15, camera_index=selected)
+            # Scan with the probed capture instead of reopening the device.
+            with open_first_readable_camera(preferred) as (selected, capture):
+                scan_result = scan_barcode_from_webcam(
+                    timeout_seconds=15,
+                    camera_index=selected or self.camera_idx_var.get(),
+                    capture=capture,
+                )
             self.after(0, lambda: self._on_camera_scan_done(scan_result.barcode, scan_result.error))
 
         threading.Thread(target=worker, daemon=True).start()
@@ -563,24 +782,61 @@ class EcoScanDesktopApp(tk.Tk):
             self.scan_status.configure(text=error or "No barcode detected.")
             messagebox.showwarning("Scan Failed", error or "No barcode detected.")
 
+    def _run_async(
+        self,
+        fn: Callable[[], Any],
+        on_done: Callable[[Any], None],
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ) -> None:
+        """Run fn on the worker pool and hand its result, or its exception, to the Tk thread.
+
+        Pool threads live as long as the app, so each keeps its cached SQLite connection.
+        """
+        if on_error is None:
+            on_error = self._show_background_error
+
+        def worker() -> None:
+            try:
+                result = fn()
+            except Exception as exc:  # noqa: BLE001
+                # Bind exc now: the name is unbound once the except block exits.
+                self.after(0, lambda error=exc: on_error(error))
+                return
+            self.after(0, lambda: on_done(result))
+
+        self._pool.submit(worker)
+
+    def _show_background_error(self, exc: Exception) -> None:
+        messagebox.showerror("Update Failed", str(exc))
+
     def refresh_dashboard(self) -> None:
-        live_score = get_live_environmental_score(days=7)
-        streak = get_current_streak()
-        total_co2 = get_total_co2()
-        total_scans = get_total_scans()
+        self._run_async(lambda: get_dashboard_bundle(days=7), self._apply_dashboard)
 
-        self.metric_live.configure(text=str(live_score))
-        self.metric_streak.configure(text=f"{streak} days")
-        self.metric_co2.configure(text=f"{total_co2:.2f} kg")
-        self.metric_scans.configure(text=str(total_scans))
+    def _apply_dashboard(self, values: Dict[str, Any]) -> None:
+        self.metric_live.configure(text=str(values["live_score"]))
+        self.metric_streak.configure(text=f"{values['streak']} days")
+        self.metric_co2.configure(text=f"{values['total_co2']:.2f} kg")
+        self.metric_scans.configure(text=str(values["total_scans"]))
 
     def refresh_history(self) -> None:
-        for item in self.history_tree.get_children():
-            self.history_tree.delete(item)
+        self._run_async(self._compute_history, self._apply_history)
+
+    def _compute_history(self) -> Optional[tuple[int, list[Dict[str, Any]]]]:
+        # Scans are append-only, so an unchanged max id means the tree is already current.
+        max_id = get_max_scan_id()
+        if max_id == self._last_history_max_id:
+            return None
+        return max_id, get_scan_history_raw(limit=200)
 
-        for row in get_scan_history(limit=200):
-            impact = row["impact_score"]
-            tag = "impact_green" if impact == "Green" else "impact_red" if impact == "Red" else "impact_yellow"
+    def _apply_history(self, history: Optional[tuple[int, list[Dict[str, Any]]]]) -> None:
+        if history is None:
+            return
+        max_id, rows = history
+        # Detach while repopulating so Tk lays the tree out once instead of per row.
+        self.history_tree.pack_forget()
+        self.history_tree.delete(*self.history_tree.get_children())
+
+        for row in rows:
             self.history_tree.insert(
                 "",
                 tk.END,
@@ -592,22 +848,28 @@ class EcoScanDesktopApp(tk.Tk):
                     f"{row['co2_estimate']:.2f}",
                     row["timestamp"],
                 ),
-                tags=(tag,),
+                tags=(self.HISTORY_TAGS.get(row["impact_score"], "impact_yellow"),),
             )
+        self.history_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, before=self.history_scroll)
+        self._last_history_max_id = max_id
 
     def refresh_analytics(self) -> None:
-        weekly = get_weekly_co2_series()
-        dist = get_impact_distribution()
-        trend = get_trend_line(days=30)
+        self._run_async(lambda: get_analytics_bundle(days_week=7, days_trend=30), self._apply_analytics)
+
+    def _apply_analytics(self, values: Dict[str, Any]) -> None:
+        weekly = values["weekly"]
+        trend = values["trend"]
+
+        totals = values["totals"]
 
         summary = [
-            f"Total scans: {get_total_scans()}",
-            f"Total CO2 footprint: {get_total_co2():.2f} kg",
-            f"Current streak: {get_current_streak()} day(s)",
+            f"Total scans: {totals['total_scans']}",
+            f"Total CO2 footprint: {totals['total_co2']:.2f} kg",
+            f"Current streak: {totals['streak']} day(s)",
             "",
             "Impact distribution:",
         ]
-        for row in dist:
+        for row in values["dist"]:
             summary.append(f"- {row['impact_score']}: {row['count']}")
 
         self.analytics_summary.configure(state=tk.NORMAL)
@@ -623,6 +885,7 @@ class EcoScanDesktopApp(tk.Tk):
         self.weekly_canvas.delete("all")
         w = self.weekly_canvas.winfo_width() or 520
         h = self.weekly_canvas.winfo_height() or 300
+        self._last_weekly_size = (w, h)
         self.weekly_canvas.create_text(16, 16, anchor="nw", fill=TEXT_PRIMARY, text="Weekly CO2 (kg)", font=("Helvetica", 12, "bold"))
         self.weekly_canvas.create_line(14, 34, w - 14, 34, fill="#243045")
 
@@ -636,19 +899,24 @@ class EcoScanDesktopApp(tk.Tk):
         base_y = h - 40
         usable_h = h - 90
 
+        # Call Tcl directly; the Python create_* wrappers re-parse their options on every item.
+        call = self.weekly_canvas.tk.call
+        path = self.weekly_canvas._w
         for i, item in enumerate(data):
             val = float(item["co2"])
             x1 = start_x + i * bar_w
             x2 = x1 + int(bar_w * 0.72)
             y1 = base_y - int((val / max_val) * usable_h)
-            self.weekly_canvas.create_rectangle(x1, y1, x2, base_y, fill=ACCENT, outline="")
-            self.weekly_canvas.create_text((x1 + x2) / 2, y1 - 10, fill=TEXT_PRIMARY, text=f"{val:.1f}", font=("Helvetica", 9))
-            self.weekly_canvas.create_text((x1 + x2) / 2, base_y + 12, fill=TEXT_MUTED, text=item["day"][5:], font=("Helvetica", 9))
+            mid = (x1 + x2) / 2
+            call(path, "create", "rectangle", x1, y1, x2, base_y, "-fill", ACCENT, "-outline", "")
+            call(path, "create", "text", mid, y1 - 10, "-fill", TEXT_PRIMARY, "-text", f"{val:.1f}", "-font", "Helvetica 9")
+            call(path, "create", "text", mid, base_y + 12, "-fill", TEXT_MUTED, "-text", item["day"][5:], "-font", "Helvetica 9")
 
     def _draw_trend_line(self, data: list[Dict[str, Any]]) -> None:
         self.trend_canvas.delete("all")
         w = self.trend_canvas.winfo_width() or 520
         h = self.trend_canvas.winfo_height() or 300
+        self._last_trend_size = (w, h)
         self.trend_canvas.create_text(16, 16, anchor="nw", fill=TEXT_PRIMARY, text="30-Day CO2 Trend", font=("Helvetica", 12, "bold"))
         self.trend_canvas.create_line(14, 34, w - 14, 34, fill="#243045")
 
@@ -670,12 +938,15 @@ class EcoScanDesktopApp(tk.Tk):
             points.extend([x, y])
 
         self.trend_canvas.create_line(*points, fill="#76f7c4", width=3, smooth=True)
+        call = self.trend_canvas.tk.call
+        path = self.trend_canvas._w
         for i in range(0, len(points), 2):
-            self.trend_canvas.create_oval(points[i] - 3, points[i + 1] - 3, points[i] + 3, points[i + 1] + 3, fill=ACCENT, outline="")
+            x, y = points[i], points[i + 1]
+            call(path, "create", "oval", x - 3, y - 3, x + 3, y + 3, "-fill", ACCENT, "-outline", "")
 
     def export_monthly_csv(self) -> None:
         today = dt.date.today()
-        rows = get_monthly_scans(today.year, today.month)
+        rows = get_monthly_scans_tuples(today.year, today.month)
         if not rows:
             messagebox.showinfo("No Data", "No scans found for the current month.")
             return
@@ -689,34 +960,18 @@ class EcoScanDesktopApp(tk.Tk):
         if not destination:
             return
 
-        with Path(destination).open("w", newline="", encoding="utf-8") as file:
-            writer = csv.writer(file)
-            writer.writerow(
-                [
-                    "id",
-                    "product_name",
-                    "barcode",
-                    "city",
-                    "impact_score",
-                    "disposal_type",
-                    "co2_estimate",
-                    "timestamp",
-                ]
-            )
-            for row in rows:
-                writer.writerow(
-                    [
-                        row["id"],
-                        row["product_name"],
-                        row["barcode"],
-                        row["city"],
-                        row["impact_score"],
-                        row["disposal_type"],
-                        row["co2_estimate"],
-                        row["timestamp"],
-                    ]
-                )
-        messagebox.showinfo("Export Complete", f"Saved: {destination}")
+        def write_report() -> str:
+            with Path(destination).open("w", newline="", encoding="utf-8", buffering=1 << 20) as file:
+                writer = csv.writer(file)
+                writer.writerow(CSV_COLUMNS)
+                writer.writerows(rows)
+            return destination
+
+        self._run_async(
+            write_report,
+            lambda path: messagebox.showinfo("Export Complete", f"Saved: {path}"),
+            lambda exc: messagebox.showerror("Export Failed", str(exc)),
+        )
 
 
 def main() -> None:
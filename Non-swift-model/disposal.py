@@ -2,8 +2,14 @@
 
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Dict
 
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - optional faster multi-pattern matching
+    ahocorasick = None
+
 SUPPORTED_CITIES = ("San Francisco", "Chicago")
 
 CITY_DISPOSAL_RULES = {
@@ -20,23 +26,77 @@ CITY_DISPOSAL_RULES = {
 }
 
 
+# Known materials in priority order; earlier entries win when several appear in one text.
+MATERIALS = tuple(dict.fromkeys(material for rules in CITY_DISPOSAL_RULES.values() for material in rules))
+# Per-material city actions, looked up once the matcher has picked the winning material.
+MATERIAL_ACTIONS = {
+    material: {city: rules[material] for city, rules in CITY_DISPOSAL_RULES.items() if material in rules}
+    for material in MATERIALS
+}
+
+_LEAF = ""
+
+
+def _build_automaton():
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for priority, material in enumerate(MATERIALS):
+        automaton.add_word(material, (priority, material))
+    automaton.make_automaton()
+    return automaton
+
+
+def _build_trie() -> Dict:
+    """Dict-of-dicts prefix trie over every material, used when pyahocorasick is missing."""
+    trie: Dict = {}
+    for priority, material in enumerate(MATERIALS):
+        node = trie
+        for char in material:
+            node = node.setdefault(char, {})
+        node[_LEAF] = (priority, material)
+    return trie
+
+
+_AUTOMATON = _build_automaton()
+_TRIE = _build_trie() if _AUTOMATON is None else None
+
+
+def _trie_matches(text: str):
+    for start in range(len(text)):
+        node = _TRIE
+        for char in text[start:]:
+            node = node.get(char)
+            if node is None:
+                break
+            if _LEAF in node:
+                yield node[_LEAF]
+
+
 def detect_material(packaging_text: str) -> str:
     """Extract simplified material type from packaging text."""
-    text = packaging_text.lower()
-    if "plastic bottle" in text:
-        return "plastic bottle"
-    if "glass bottle" in text:
-        return "glass bottle"
-    if "greasy cardboard" in text:
-        return "greasy cardboard"
-    return "unknown"
+    return _detect_material(packaging_text.lower())
+
+
+@lru_cache(maxsize=1024)
+def _detect_material(text: str) -> str:
+    if _AUTOMATON is not None:
+        matches = [match for _, match in _AUTOMATON.iter(text)]
+    else:
+        matches = list(_trie_matches(text))
+    return min(matches)[1] if matches else "unknown"
 
 
 def get_disposal_instruction(city: str, packaging_text: str) -> Dict[str, str]:
     """Return disposal decision payload for UI and storage."""
-    material = detect_material(packaging_text or "")
-    city_rules = CITY_DISPOSAL_RULES.get(city, {})
-    disposal_type = city_rules.get(material, "Check Local Guidelines")
+    # Copy so callers cannot mutate the memoized payload.
+    return dict(_disposal_instruction(city, (packaging_text or "").lower()))
+
+
+@lru_cache(maxsize=1024)
+def _disposal_instruction(city: str, packaging_text: str) -> Dict[str, str]:
+    material = _detect_material(packaging_text)
+    disposal_type = MATERIAL_ACTIONS.get(material, {}).get(city, "Check Local Guidelines")
 
     if disposal_type == "Recycle":
         icon = "♻"
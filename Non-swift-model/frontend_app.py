@@ -3,18 +3,39 @@
 from __future__ import annotations
 
 import datetime as dt
-from typing import Any, Dict, List, Optional
+import gc
+import html
+import io
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import cv2
 import plotly.graph_objects as go
 import requests
 import streamlit as st
 import streamlit.components.v1 as components
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
 
-from camera import find_first_readable_camera, scan_barcode_from_webcam, test_camera_access
+from camera import open_first_readable_camera, scan_barcode_from_webcam, test_camera_access
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional faster JSON decoding
+    orjson = None
 
 API_BASE_DEFAULT = "http://192.168.1.118:8000"
 STREAMLIT_PHONE_URL = "http://192.168.1.118:8501"
+PREVIEW_INTERVAL_SECONDS = 0.1
+CSV_CHUNK_BYTES = 64 * 1024
+OVERVIEW_TTL_SECONDS = 10
+_IMPACT_COLORS = {"Green": "#3dffb6", "Yellow": "#ffe066", "Red": "#ff5d73"}
+_DEFAULT_IMPACT_COLOR = "#4cf2a0"
 
 
 def setup_pwa() -> None:
@@ -28,23 +49,26 @@ def setup_pwa() -> None:
             sw: ["/app/static/service-worker.js", "/static/service-worker.js"]
           };
 
+          // Probes run concurrently, but the earliest reachable candidate wins, not the fastest.
           const pickFirstReachable = async (urls) => {
-            for (const url of urls) {
-              try {
-                const res = await fetch(url, { method: "HEAD", cache: "no-cache" });
-                if (res.ok) return url;
-              } catch (e) {}
-            }
-            return urls[0];
+            const results = await Promise.allSettled(
+              urls.map((url) =>
+                fetch(url, { method: "HEAD", cache: "no-cache" }).then((res) => res.ok)
+              )
+            );
+            const index = results.findIndex((r) => r.status === "fulfilled" && r.value);
+            return index === -1 ? urls[0] : urls[index];
           };
 
           (async () => {
             const head = window.parent.document.head;
             const body = window.parent.document.body;
 
-            const manifestUrl = await pickFirstReachable(candidates.manifest);
-            const cssUrl = await pickFirstReachable(candidates.css);
-            const swUrl = await pickFirstReachable(candidates.sw);
+            const [manifestUrl, cssUrl, swUrl] = await Promise.all([
+              pickFirstReachable(candidates.manifest),
+              pickFirstReachable(candidates.css),
+              pickFirstReachable(candidates.sw)
+            ]);
 
             const setMeta = (name, content, attr = "name") => {
               let tag = head.querySelector(`meta[${attr}="${name}"]`);
@@ -134,351 +158,450 @@ def trigger_haptic(ms: int = 35) -> None:
 
 
 def impact_color(impact_score: Optional[str]) -> str:
-    mapping = {"Green": "#3dffb6", "Yellow": "#ffe066", "Red": "#ff5d73"}
-    return mapping.get(impact_score or "", "#4cf2a0")
+    return _IMPACT_COLORS.get(impact_score or "", _DEFAULT_IMPACT_COLOR)
+
+
+_STATIC_CSS = """
+    <style>
+        @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@500;700;900&family=Manrope:wght@400;600;700;800&display=swap');
+        :root {
+            --bg: #0e1117;
+            --panel: rgba(255, 255, 255, 0.06);
+            --stroke: rgba(255, 255, 255, 0.16);
+            --text: #e9edf5;
+            --muted: #9ba6bd;
+            --accent: #4cf2a0;
+        }
+        .stApp {
+            background:
+                radial-gradient(circle at 15% 20%, color-mix(in srgb, var(--impact) 28%, transparent), transparent 40%),
+                radial-gradient(circle at 80% 10%, rgba(76, 242, 160, 0.15), transparent 38%),
+                linear-gradient(160deg, #0b0f15 0%, #0e1117 58%, #0a1018 100%);
+            color: var(--text);
+        }
+        .block-container {
+            max-width: 1200px;
+            padding-top: 1.6rem;
+            padding-bottom: 2.5rem;
+        }
+        .title-wrap {
+            border: 1px solid var(--stroke);
+            border-radius: 26px;
+            padding: 1.5rem 1.6rem;
+            background: linear-gradient(140deg, rgba(255,255,255,0.08), rgba(255,255,255,0.03));
+            box-shadow: 0 0 30px rgba(0,0,0,0.45), inset 0 0 26px rgba(76,242,160,0.08);
+            backdrop-filter: blur(14px);
+            animation: fadeIn 0.6s ease;
+        }
+        .title-wrap h1 {
+            margin: 0;
+            font-family: "Orbitron", sans-serif;
+            font-weight: 900;
+            letter-spacing: 0.08em;
+            font-size: clamp(2rem, 4vw, 3rem);
+        }
+        .subtitle {
+            margin-top: 0.3rem;
+            color: var(--muted);
+            font-size: 1.03rem;
+        }
+        .glass-card {
+            border: 1px solid var(--stroke);
+            border-radius: 20px;
+            padding: 1rem 1.1rem;
+            margin-bottom: 1rem;
+            background: var(--panel);
+            backdrop-filter: blur(12px);
+            box-shadow: 0 8px 28px rgba(0,0,0,0.35);
+            animation: fadeIn 0.5s ease;
+        }
+        .metric-grid {
+            display: grid;
+            grid-template-columns: repeat(3, 1fr);
+            gap: 1rem;
+        }
+        .metric-value {
+            font-family: "Orbitron", sans-serif;
+            font-size: 1.8rem;
+            font-weight: 700;
+            line-height: 1.2;
+        }
+        .metric-label {
+            color: var(--muted);
+            font-size: 0.86rem;
+            letter-spacing: 0.03em;
+            text-transform: uppercase;
+        }
+        .impact-badge {
+            display: inline-flex;
+            align-items: center;
+            border-radius: 999px;
+            padding: 0.5rem 1rem;
+            border: 1px solid color-mix(in srgb, var(--impact) 70%, white);
+            background: color-mix(in srgb, var(--impact) 20%, transparent);
+            box-shadow: 0 0 16px color-mix(in srgb, var(--impact) 35%, transparent);
+            font-weight: 800;
+            letter-spacing: 0.04em;
+            text-transform: uppercase;
+            animation: pulse 2s infinite;
+        }
+        .scan-cta .stButton > button {
+            width: 100%;
+            border-radius: 14px;
+            border: 1px solid rgba(76, 242, 160, 0.45);
+            color: #d9ffef;
+            background: linear-gradient(135deg, rgba(76,242,160,0.32), rgba(76,242,160,0.12));
+            box-shadow: 0 0 18px rgba(76,242,160,0.28);
+            font-weight: 700;
+            transition: all 0.25s ease;
+        }
+        .scan-cta .stButton > button:hover {
+            transform: translateY(-1px);
+            box-shadow: 0 0 26px rgba(76,242,160,0.4);
+        }
+        .history-row {
+            display: grid;
+            grid-template-columns: 2fr 1fr 1fr 1fr 1.3fr;
+            gap: 0.5rem;
+            font-size: 0.9rem;
+            padding: 0.45rem 0;
+            border-bottom: 1px solid rgba(255,255,255,0.09);
+        }
+        .history-head {
+            color: var(--muted);
+            font-weight: 700;
+            text-transform: uppercase;
+            font-size: 0.78rem;
+            letter-spacing: 0.04em;
+        }
+        .stTextInput > div > div > input,
+        .stSelectbox > div > div {
+            border-radius: 12px !important;
+            background: rgba(255,255,255,0.07) !important;
+            color: var(--text) !important;
+            border: 1px solid var(--stroke) !important;
+        }
+        @keyframes fadeIn {
+            from { opacity: 0; transform: translateY(6px); }
+            to { opacity: 1; transform: translateY(0); }
+        }
+        @keyframes pulse {
+            0% { box-shadow: 0 0 12px color-mix(in srgb, var(--impact) 45%, transparent); }
+            50% { box-shadow: 0 0 24px color-mix(in srgb, var(--impact) 60%, transparent); }
+            100% { box-shadow: 0 0 12px color-mix(in srgb, var(--impact) 45%, transparent); }
+        }
+        @media (max-width: 880px) {
+            .title-wrap {
+                border-radius: 18px;
+                padding: 1rem;
+            }
+            .scan-cta .stButton > button {
+                min-height: 52px;
+                font-size: 1rem;
+            }
+            .glass-card {
+                border-radius: 16px;
+                padding: 0.9rem;
+            }
+            .history-row {
+                grid-template-columns: 1fr;
+                gap: 0.2rem;
+            }
+            .metric-grid {
+                grid-template-columns: 1fr;
+                gap: 0;
+            }
+        }
+    </style>
+"""
 
 
 def inject_css(current_impact: Optional[str]) -> None:
+    # The stylesheet is constant; only the impact glow changes between reruns.
     glow = impact_color(current_impact)
     st.markdown(
-        f"""
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@500;700;900&family=Manrope:wght@400;600;700;800&display=swap');
-            :root {{
-                --bg: #0e1117;
-                --panel: rgba(255, 255, 255, 0.06);
-                --stroke: rgba(255, 255, 255, 0.16);
-                --text: #e9edf5;
-                --muted: #9ba6bd;
-                --accent: #4cf2a0;
-                --impact: {glow};
-            }}
-            .stApp {{
-                background:
-                    radial-gradient(circle at 15% 20%, color-mix(in srgb, var(--impact) 28%, transparent), transparent 40%),
-                    radial-gradient(circle at 80% 10%, rgba(76, 242, 160, 0.15), transparent 38%),
-                    linear-gradient(160deg, #0b0f15 0%, #0e1117 58%, #0a1018 100%);
-                color: var(--text);
-            }}
-            .block-container {{
-                max-width: 1200px;
-                padding-top: 1.6rem;
-                padding-bottom: 2.5rem;
-            }}
-            .title-wrap {{
-                border: 1px solid var(--stroke);
-                border-radius: 26px;
-                padding: 1.5rem 1.6rem;
-                background: linear-gradient(140deg, rgba(255,255,255,0.08), rgba(255,255,255,0.03));
-                box-shadow: 0 0 30px rgba(0,0,0,0.45), inset 0 0 26px rgba(76,242,160,0.08);
-                backdrop-filter: blur(14px);
-                animation: fadeIn 0.6s ease;
-            }}
-            .title-wrap h1 {{
-                margin: 0;
-                font-family: "Orbitron", sans-serif;
-                font-weight: 900;
-                letter-spacing: 0.08em;
-                font-size: clamp(2rem, 4vw, 3rem);
-            }}
-            .subtitle {{
-                margin-top: 0.3rem;
-                color: var(--muted);
-                font-size: 1.03rem;
-            }}
-            .glass-card {{
-                border: 1px solid var(--stroke);
-                border-radius: 20px;
-                padding: 1rem 1.1rem;
-                margin-bottom: 1rem;
-                background: var(--panel);
-                backdrop-filter: blur(12px);
-                box-shadow: 0 8px 28px rgba(0,0,0,0.35);
-                animation: fadeIn 0.5s ease;
-            }}
-            .metric-value {{
-                font-family: "Orbitron", sans-serif;
-                font-size: 1.8rem;
-                font-weight: 700;
-                line-height: 1.2;
-            }}
-            .metric-label {{
-                color: var(--muted);
-                font-size: 0.86rem;
-                letter-spacing: 0.03em;
-                text-transform: uppercase;
-            }}
-            .impact-badge {{
-                display: inline-flex;
-                align-items: center;
-                border-radius: 999px;
-                padding: 0.5rem 1rem;
-                border: 1px solid color-mix(in srgb, var(--impact) 70%, white);
-                background: color-mix(in srgb, var(--impact) 20%, transparent);
-                box-shadow: 0 0 16px color-mix(in srgb, var(--impact) 35%, transparent);
-                font-weight: 800;
-                letter-spacing: 0.04em;
-                text-transform: uppercase;
-                animation: pulse 2s infinite;
-            }}
-            .scan-cta .stButton > button {{
-                width: 100%;
-                border-radius: 14px;
-                border: 1px solid rgba(76, 242, 160, 0.45);
-                color: #d9ffef;
-                background: linear-gradient(135deg, rgba(76,242,160,0.32), rgba(76,242,160,0.12));
-                box-shadow: 0 0 18px rgba(76,242,160,0.28);
-                font-weight: 700;
-                transition: all 0.25s ease;
-            }}
-            .scan-cta .stButton > button:hover {{
-                transform: translateY(-1px);
-                box-shadow: 0 0 26px rgba(76,242,160,0.4);
-            }}
-            .history-row {{
-                display: grid;
-                grid-template-columns: 2fr 1fr 1fr 1fr 1.3fr;
-                gap: 0.5rem;
-                font-size: 0.9rem;
-                padding: 0.45rem 0;
-                border-bottom: 1px solid rgba(255,255,255,0.09);
-            }}
-            .history-head {{
-                color: var(--muted);
-                font-weight: 700;
-                text-transform: uppercase;
-                font-size: 0.78rem;
-                letter-spacing: 0.04em;
-            }}
-            .stTextInput > div > div > input,
-            .stSelectbox > div > div {{
-                border-radius: 12px !important;
-                background: rgba(255,255,255,0.07) !important;
-                color: var(--text) !important;
-                border: 1px solid var(--stroke) !important;
-            }}
-            @keyframes fadeIn {{
-                from {{ opacity: 0; transform: translateY(6px); }}
-                to {{ opacity: 1; transform: translateY(0); }}
-            }}
-            @keyframes pulse {{
-                0% {{ box-shadow: 0 0 12px color-mix(in srgb, var(--impact) 45%, transparent); }}
-                50% {{ box-shadow: 0 0 24px color-mix(in srgb, var(--impact) 60%, transparent); }}
-                100% {{ box-shadow: 0 0 12px color-mix(in srgb, var(--impact) 45%, transparent); }}
-            }}
-            @media (max-width: 880px) {{
-                .title-wrap {{
-                    border-radius: 18px;
-                    padding: 1rem;
-                }}
-                .scan-cta .stButton > button {{
-                    min-height: 52px;
-                    font-size: 1rem;
-                }}
-                .glass-card {{
-                    border-radius: 16px;
-                    padding: 0.9rem;
-                }}
-                .history-row {{
-                    grid-template-columns: 1fr;
-                    gap: 0.2rem;
-                }}
-            }}
-        </style>
-        """,
+        f"{_STATIC_CSS}<style>:root {{ --impact: {glow}; }}</style>",
         unsafe_allow_html=True,
     )
 
 
+@st.cache_resource
+def _session() -> requests.Session:
+    """Shared keep-alive session so reruns reuse backend connections."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # Advertises br alongside gzip only when a brotli decoder is installed.
+    session.headers.update({"Accept-Encoding": ACCEPT_ENCODING})
+    return session
+
+
 def api_call(
     method: str, endpoint: str, base_url: str, payload: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     url = f"{base_url.rstrip('/')}{endpoint}"
     try:
         if method == "GET":
-            response = requests.get(url, timeout=15)
+            response = _session().get(url, timeout=15)
         elif method == "POST":
-            response = requests.post(url, json=payload or {}, timeout=25)
+            response = _session().post(url, json=payload or {}, timeout=25)
         else:
             raise ValueError(f"Unsupported method: {method}")
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as exc:
+        return orjson.loads(response.content) if orjson is not None else response.json()
+    except (requests.RequestException, ValueError) as exc:  # orjson.JSONDecodeError is a ValueError.
+        raise RuntimeError(f"API request failed: {exc}") from exc
+
+
+@st.cache_resource
+def _pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=4)
+
+
+def api_call_many(calls: Dict[str, Tuple[Any, ...]]) -> Dict[str, Any]:
+    """Run independent api_call requests concurrently, keyed like ``calls``."""
+    futures = {key: _pool().submit(api_call, *args) for key, args in calls.items()}
+    return {key: future.result() for key, future in futures.items()}
+
+
+def api_batch(base_url: str, routes: List[str]) -> Dict[str, Any]:
+    """Fetch several GET routes in one round trip; falls back per route on older backends."""
+    url = f"{base_url.rstrip('/')}/batch"
+    try:
+        response = _session().post(url, json={"routes": routes}, timeout=15)
+        if response.status_code == 404:
+            return api_call_many({route: ("GET", route, base_url) for route in routes})
+        response.raise_for_status()
+        return orjson.loads(response.content) if orjson is not None else response.json()
+    except (requests.RequestException, ValueError) as exc:  # orjson.JSONDecodeError is a ValueError.
         raise RuntimeError(f"API request failed: {exc}") from exc
 
 
+@st.cache_data(ttl=OVERVIEW_TTL_SECONDS, show_spinner=False)
+def _get_overview(base_url: str, history_limit: int) -> Dict[str, Any]:
+    """Analytics plus recent history, reused across reruns until a scan is saved.
+
+    A ``history_limit`` of 0 skips the history route for pages that do not show it.
+    """
+    if not history_limit:
+        return {"analytics": api_call("GET", "/analytics", base_url), "history": []}
+    history_route = f"/history?limit={history_limit}"
+    bundle = api_batch(base_url, ["/analytics", history_route])
+    return {"analytics": bundle["/analytics"], "history": bundle[history_route].get("items", [])}
+
+
+def _load_overview(base_url: str, history_limit: int) -> Dict[str, Any]:
+    """Per-session copy of the overview so page switches skip even the data-cache unpickle."""
+    now = time.monotonic()
+    cached = st.session_state.get("_overview_cache")
+    # An entry fetched with a longer history also serves pages that need less.
+    if (
+        cached
+        and cached[0] == base_url
+        and cached[1] >= history_limit
+        and now - cached[3] <= OVERVIEW_TTL_SECONDS
+    ):
+        return cached[2]
+    overview = _get_overview(base_url, history_limit)
+    st.session_state._overview_cache = (base_url, history_limit, overview, now)
+    return overview
+
+
 def fetch_csv_report(base_url: str, year: int, month: int) -> bytes:
     url = f"{base_url.rstrip('/')}/export/monthly?year={year}&month={month}"
-    response = requests.get(url, timeout=25)
-    response.raise_for_status()
-    return response.content
+    with _session().get(url, timeout=25, stream=True) as response:
+        response.raise_for_status()
+        # Copy the body in chunks rather than letting requests buffer it twice.
+        response.raw.decode_content = True
+        buffer = io.BytesIO()
+        shutil.copyfileobj(response.raw, buffer, length=CSV_CHUNK_BYTES)
+    return buffer.getvalue()
 
 
 def render_metrics(analytics: Dict[str, Any]) -> None:
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown(
-            f"""
+    get = analytics.get
+    score = get("environmental_score", 0)
+    streak = get("streak", 0)
+    total_co2 = format(get("total_co2", 0.0), ".2f")
+    # One element for all three cards instead of a column layout with three deltas.
+    st.markdown(
+        f"""
+        <div class="metric-grid">
             <div class="glass-card">
-                <div class="metric-value">{analytics.get("environmental_score", 0)}</div>
+                <div class="metric-value">{score}</div>
                 <div class="metric-label">Live Environmental Score (7d)</div>
             </div>
-            """,
-            unsafe_allow_html=True,
-        )
-    with col2:
-        st.markdown(
-            f"""
             <div class="glass-card">
-                <div class="metric-value">{analytics.get("streak", 0)} 🔥</div>
+                <div class="metric-value">{streak} 🔥</div>
                 <div class="metric-label">Daily Scan Streak</div>
             </div>
-            """,
-            unsafe_allow_html=True,
-        )
-    with col3:
-        st.markdown(
-            f"""
             <div class="glass-card">
-                <div class="metric-value">{analytics.get("total_co2", 0):.2f} kg</div>
+                <div class="metric-value">{total_co2} kg</div>
                 <div class="metric-label">Cumulative CO2 Footprint</div>
             </div>
-            """,
-            unsafe_allow_html=True,
-        )
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
 
 
 def render_result(result: Dict[str, Any]) -> None:
-    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    product_image = result.get("product_image")
+    impact_score, impact_label = result["impact_score"], result["impact_label"]
+    disposal_icon, disposal_type = result["disposal_icon"], result["disposal_type"]
+    co2_estimate = format(result["co2_estimate"], ".2f")
+    markdown, write = st.markdown, st.write
+
+    markdown('<div class="glass-card">', unsafe_allow_html=True)
     center_left, center_right = st.columns([1.0, 1.2])
 
     with center_left:
-        st.markdown(f"### {result['product_name']}")
-        if result.get("product_image"):
-            st.image(result["product_image"], use_container_width=True)
+        markdown(f"### {result['product_name']}")
+        if product_image:
+            st.image(product_image, use_container_width=True)
         else:
             st.info("No product image available.")
 
     with center_right:
-        st.markdown(
-            f"<div class='impact-badge'>{result['impact_score']} • {result['impact_label']}</div>",
+        markdown(
+            f"<div class='impact-badge'>{impact_score} • {impact_label}</div>",
             unsafe_allow_html=True,
         )
-        st.write(result["impact_reason"])
-        st.markdown("#### Disposal")
-        st.write(
-            f"{result['disposal_icon']} **{result['disposal_type']}**  \n"
-            f"{result['disposal_detail']}"
-        )
-        st.markdown("#### CO2 Estimate")
-        st.write(f"**{result['co2_estimate']:.2f} kg CO2e**")
-        st.markdown("#### Suggested Lower-Impact Alternative")
-        st.write(result["suggested_alternative"])
+        write(result["impact_reason"])
+        markdown("#### Disposal")
+        write(f"{disposal_icon} **{disposal_type}**  \n{result['disposal_detail']}")
+        markdown("#### CO2 Estimate")
+        write(f"**{co2_estimate} kg CO2e**")
+        markdown("#### Suggested Lower-Impact Alternative")
+        write(result["suggested_alternative"])
 
-    st.markdown("</div>", unsafe_allow_html=True)
+    markdown("</div>", unsafe_allow_html=True)
 
 
 def render_history(items: List[Dict[str, Any]]) -> None:
-    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-    st.markdown("### Recent Scans")
     if not items:
+        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+        st.markdown("### Recent Scans")
         st.info("No scans yet.")
         st.markdown("</div>", unsafe_allow_html=True)
         return
 
-    st.markdown(
+    header_html = """
+        <div class="glass-card">
+            <h3>Recent Scans</h3>
+            <div class="history-row history-head">
+                <div>Product</div>
+                <div>City</div>
+                <div>Impact</div>
+                <div>Disposal</div>
+                <div>Time</div>
+            </div>
         """
-        <div class="history-row history-head">
-            <div>Product</div>
-            <div>City</div>
-            <div>Impact</div>
-            <div>Disposal</div>
-            <div>Time</div>
-        </div>
-        """,
-        unsafe_allow_html=True,
+    # One element for the whole table instead of one Streamlit delta per row.
+    escape = html.escape
+    rows_html = "".join(
+        '<div class="history-row">'
+        f"<div>{escape(str(row['product_name']))}</div>"
+        f"<div>{escape(str(row['city']))}</div>"
+        f"<div>{escape(str(row['impact_score']))}</div>"
+        f"<div>{escape(str(row['disposal_type']))}</div>"
+        f"<div>{escape(str(row['timestamp']))}</div>"
+        "</div>"
+        for row in items
     )
-    for row in items:
-        st.markdown(
-            f"""
-            <div class="history-row">
-                <div>{row['product_name']}</div>
-                <div>{row['city']}</div>
-                <div>{row['impact_score']}</div>
-                <div>{row['disposal_type']}</div>
-                <div>{row['timestamp']}</div>
-            </div>
-            """,
-            unsafe_allow_html=True,
+    st.markdown(header_html + rows_html + "</div>", unsafe_allow_html=True)
+
+
+_BASE_LAYOUT = dict(
+    template="plotly_dark",
+    paper_bgcolor="rgba(0,0,0,0)",
+    plot_bgcolor="rgba(0,0,0,0)",
+    margin=dict(l=20, r=20, t=50, b=20),
+)
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _weekly_fig(weekly: Tuple[Tuple[str, float], ...]) -> go.Figure:
+    fig_weekly = go.Figure()
+    fig_weekly.add_trace(
+        go.Bar(
+            x=[day for day, _ in weekly],
+            y=[co2 for _, co2 in weekly],
+            marker=dict(color="#4cf2a0"),
+            name="CO2 (kg)",
         )
-    st.markdown("</div>", unsafe_allow_html=True)
-
-
-def render_analytics_charts(analytics: Dict[str, Any]) -> None:
-    weekly = analytics.get("weekly_co2", [])
-    pie_data = analytics.get("impact_distribution", [])
-    trend = analytics.get("trend_line", [])
-
-    col1, col2 = st.columns(2)
-
-    with col1:
-        fig_weekly = go.Figure()
-        fig_weekly.add_trace(
-            go.Bar(
-                x=[item["day"] for item in weekly],
-                y=[item["co2"] for item in weekly],
-                marker=dict(color="#4cf2a0"),
-                name="CO2 (kg)",
+    )
+    fig_weekly.update_layout(title="Weekly CO2 Impact", **_BASE_LAYOUT)
+    return fig_weekly
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _pie_fig(pie_data: Tuple[Tuple[str, int], ...]) -> go.Figure:
+    fig_pie = go.Figure(
+        data=[
+            go.Pie(
+                labels=[impact for impact, _ in pie_data],
+                values=[count for _, count in pie_data],
+                hole=0.48,
+                marker=dict(colors=["#ff5d73", "#ffe066", "#3dffb6"]),
             )
-        )
-        fig_weekly.update_layout(
-            title="Weekly CO2 Impact",
-            template="plotly_dark",
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            margin=dict(l=20, r=20, t=50, b=20),
-        )
-        st.plotly_chart(fig_weekly, use_container_width=True)
+        ]
+    )
+    fig_pie.update_layout(title="Impact Distribution", **_BASE_LAYOUT)
+    return fig_pie
 
-    with col2:
-        fig_pie = go.Figure(
-            data=[
-                go.Pie(
-                    labels=[item["impact_score"] for item in pie_data],
-                    values=[item["count"] for item in pie_data],
-                    hole=0.48,
-                    marker=dict(colors=["#ff5d73", "#ffe066", "#3dffb6"]),
-                )
-            ]
-        )
-        fig_pie.update_layout(
-            title="Impact Distribution",
-            template="plotly_dark",
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            margin=dict(l=20, r=20, t=50, b=20),
-        )
-        st.plotly_chart(fig_pie, use_container_width=True)
 
+@st.cache_data(ttl=30, show_spinner=False)
+def _trend_fig(trend: Tuple[Tuple[str, float], ...]) -> go.Figure:
     fig_trend = go.Figure()
     fig_trend.add_trace(
         go.Scatter(
-            x=[item["day"] for item in trend],
-            y=[item["co2"] for item in trend],
+            x=[day for day, _ in trend],
+            y=[co2 for _, co2 in trend],
             mode="lines+markers",
             line=dict(color="#76f7c4", width=3),
             marker=dict(size=7),
             name="CO2 Trend",
         )
     )
-    fig_trend.update_layout(
-        title="30-Day CO2 Trend Line",
-        template="plotly_dark",
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)",
-        margin=dict(l=20, r=20, t=50, b=20),
+    fig_trend.update_layout(title="30-Day CO2 Trend Line", **_BASE_LAYOUT)
+    return fig_trend
+
+
+def render_analytics_charts(analytics: Dict[str, Any]) -> None:
+    # Hashable tuples let Streamlit reuse the built figures while the data is unchanged.
+    weekly = tuple((item["day"], item["co2"]) for item in analytics.get("weekly_co2", []))
+    pie_data = tuple(
+        (item["impact_score"], item["count"]) for item in analytics.get("impact_distribution", [])
     )
-    st.plotly_chart(fig_trend, use_container_width=True)
+    trend = tuple((item["day"], item["co2"]) for item in analytics.get("trend_line", []))
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.plotly_chart(_weekly_fig(weekly), use_container_width=True)
+
+    with col2:
+        st.plotly_chart(_pie_fig(pie_data), use_container_width=True)
+
+    st.plotly_chart(_trend_fig(trend), use_container_width=True)
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    """Suspend cyclic GC for one script run; it is restored even on st.stop/st.rerun."""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
 
 
 def main() -> None:
@@ -489,6 +612,8 @@ def main() -> None:
         st.session_state.current_impact = None
     if "manual_barcode" not in st.session_state:
         st.session_state.manual_barcode = ""
+    if "scanned_barcode" not in st.session_state:
+        st.session_state.scanned_barcode = None
     if "latest_analysis" not in st.session_state:
         st.session_state.latest_analysis = None
     if "camera_index" not in st.session_state:
@@ -513,8 +638,10 @@ def main() -> None:
         st.caption("Run backend with: uvicorn main:app --host 0.0.0.0 --port 8000")
         st.caption(f"Open on iPhone Safari: {STREAMLIT_PHONE_URL}")
 
+    # The radio is drawn below the metrics; its keyed state tells us the page up front.
+    on_scanner = st.session_state.get("page", "Scanner") == "Scanner"
     try:
-        analytics = api_call("GET", "/analytics", base_url)
+        overview = _load_overview(base_url, 25 if on_scanner else 0)
     except RuntimeError as error:
         st.error(
             "Could not reach FastAPI backend. Start it with `uvicorn main:app --reload` "
@@ -522,22 +649,25 @@ def main() -> None:
         )
         st.stop()
 
+    analytics = overview["analytics"]
     render_metrics(analytics)
 
-    page = st.radio("Navigate", ["Scanner", "Analytics"], horizontal=True)
+    page = st.radio("Navigate", ["Scanner", "Analytics"], horizontal=True, key="page")
 
     if page == "Scanner":
         st.markdown('<div class="glass-card">', unsafe_allow_html=True)
         c1, c2 = st.columns([1.2, 1])
         with c1:
             city = st.selectbox("City", ["San Francisco", "Chicago"])
-            barcode_input = st.text_input(
+            if st.session_state.scanned_barcode:
+                # A widget's keyed state can only be set before the widget is created.
+                st.session_state.manual_barcode = st.session_state.scanned_barcode
+                st.session_state.scanned_barcode = None
+            st.text_input(
                 "Manual Barcode Entry",
-                value=st.session_state.manual_barcode,
-                key="barcode_input_field",
+                key="manual_barcode",
                 placeholder="Fallback manual barcode entry",
             )
-            st.session_state.manual_barcode = barcode_input.strip()
             st.session_state.force_mac_builtin = st.toggle(
                 "Use only Mac built-in camera",
                 value=st.session_state.force_mac_builtin,
@@ -565,19 +695,19 @@ def main() -> None:
         if camera_test:
             if st.session_state.force_mac_builtin:
                 preferred = [1, 2, 3, 4, 5]
-                detected_index = find_first_readable_camera(preferred)
-                if detected_index is None:
-                    st.error(
-                        "No readable built-in/local Mac camera found on indices 1-5. "
-                        "Disable built-in-only mode to test index 0."
-                    )
-                else:
-                    st.session_state.camera_index = detected_index
-                    ok, message = test_camera_access(detected_index)
-                    if ok:
-                        st.success(f"{message} Using index {detected_index}.")
+                with open_first_readable_camera(preferred) as (detected_index, capture):
+                    if detected_index is None:
+                        st.error(
+                            "No readable built-in/local Mac camera found on indices 1-5. "
+                            "Disable built-in-only mode to test index 0."
+                        )
                     else:
-                        st.error(message)
+                        st.session_state.camera_index = detected_index
+                        ok, message = test_camera_access(detected_index, capture=capture)
+                        if ok:
+                            st.success(f"{message} Using index {detected_index}.")
+                        else:
+                            st.error(message)
             else:
                 ok, message = test_camera_access(st.session_state.camera_index)
                 if ok:
@@ -587,32 +717,44 @@ def main() -> None:
 
         if scan_camera:
             scan_index = st.session_state.camera_index
-            if st.session_state.force_mac_builtin:
-                detected_index = find_first_readable_camera([1, 2, 3, 4, 5])
-                if detected_index is None:
-                    st.error(
-                        "Built-in-only mode could not find a usable Mac camera. "
-                        "Disable built-in-only mode and try manual index selection."
-                    )
-                    st.stop()
-                scan_index = detected_index
-                st.session_state.camera_index = detected_index
-
-            preview = st.empty()
-            with st.spinner("Opening webcam and scanning barcode..."):
-                scan_result = scan_barcode_from_webcam(
-                    timeout_seconds=15,
-                    camera_index=scan_index,
-                    on_frame=lambda frame: preview.image(
-                        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB),
-                        channels="RGB",
+            probe_indices = [1, 2, 3, 4, 5] if st.session_state.force_mac_builtin else []
+            # Keep the probed camera open for the scan instead of reopening the device.
+            with open_first_readable_camera(probe_indices) as (detected_index, capture):
+                if st.session_state.force_mac_builtin:
+                    if detected_index is None:
+                        st.error(
+                            "Built-in-only mode could not find a usable Mac camera. "
+                            "Disable built-in-only mode and try manual index selection."
+                        )
+                        st.stop()
+                    scan_index = detected_index
+                    st.session_state.camera_index = detected_index
+
+                preview = st.empty()
+                script_ctx = get_script_run_ctx()
+
+                def show_preview(frame: Any) -> None:
+                    # Previews arrive on the camera module's worker thread.
+                    add_script_run_ctx(threading.current_thread(), script_ctx)
+                    preview.image(
+                        frame,
+                        channels="BGR",
                         caption="Scanning... hold barcode steady",
                         use_container_width=True,
-                    ),
-                )
-            preview.empty()
+                    )
+
+                with st.spinner("Opening webcam and scanning barcode..."):
+                    scan_result = scan_barcode_from_webcam(
+                        timeout_seconds=15,
+                        camera_index=scan_index,
+                        on_frame=show_preview,
+                        capture=capture,
+                        # Cap st.image updates at ~10/s; decoding still runs at camera rate.
+                        preview_interval=PREVIEW_INTERVAL_SECONDS,
+                    )
+                preview.empty()
             if scan_result.barcode:
-                st.session_state.manual_barcode = scan_result.barcode
+                st.session_state.scanned_barcode = scan_result.barcode
                 trigger_haptic(45)
                 st.success(
                     f"Barcode detected: {scan_result.barcode} "
@@ -653,6 +795,8 @@ def main() -> None:
                         base_url,
                         {"barcode": result["barcode"], "city": result["city"]},
                     )
+                    _get_overview.clear()
+                    st.session_state.pop("_overview_cache", None)
                     trigger_haptic(65)
                     st.success(
                         "Scan saved. Disposal: "
@@ -662,7 +806,7 @@ def main() -> None:
                 except RuntimeError as error:
                     st.error(str(error))
 
-        history = api_call("GET", "/history?limit=25", base_url).get("items", [])
+        history = overview["history"]
         render_history(history)
 
         st.markdown('<div class="glass-card">', unsafe_allow_html=True)
@@ -708,4 +852,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    with _gc_paused():
+        main()
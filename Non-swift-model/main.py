@@ -2,34 +2,49 @@
 
 from __future__ import annotations
 
+import asyncio
 import csv
+import inspect
 import io
-from typing import Any, Dict, List, Optional
+import time
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
 
-import requests
+import httpx
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 
 from database import (
+    get_analytics_bundle,
     get_current_streak,
-    get_impact_distribution,
-    get_live_environmental_score,
-    get_monthly_scans,
-    get_scan_by_id,
     get_scan_history,
-    get_total_co2,
-    get_total_scans,
-    get_trend_line,
-    get_weekly_co2_series,
     init_db,
-    insert_scan,
+    insert_scan_returning,
+    iter_monthly_scans_tuples,
 )
 from disposal import SUPPORTED_CITIES, get_disposal_instruction
 from scoring import IMPACT_TO_LABEL, estimate_co2, score_product, suggest_alternative
 
-app = FastAPI(title="EcoScan AI API", version="1.0.0")
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional faster JSON encoding
+    orjson = None
+
+try:
+    import h2  # noqa: F401
+except ImportError:  # pragma: no cover - optional HTTP/2 support for httpx
+    HTTP2_AVAILABLE = False
+else:
+    HTTP2_AVAILABLE = True
+
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+app = FastAPI(title="EcoScan AI API", version="1.0.0", default_response_class=FastJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -37,14 +52,39 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+OPEN_FOOD_FACTS_URL_PREFIX = "https://world.openfoodfacts.org/api/v2/product/"
+OPEN_FOOD_FACTS_URL_SUFFIX = ".json"
+PRODUCT_CACHE_SIZE = 10_000
+PRODUCT_CACHE_TTL_SECONDS = 24 * 60 * 60
+PRODUCT_MISS_TTL_SECONDS = 5 * 60
+CSV_BATCH_ROWS = 1000
+_CSV_HEADER = b"id,product_name,barcode,city,impact_score,disposal_type,co2_estimate,timestamp\r\n"
 
-OPEN_FOOD_FACTS_URL = "https://world.openfoodfacts.org/api/v2/product/{barcode}.json"
+_DB_WRITE_LOCK = asyncio.Lock()
+
+_CITIES_SET = frozenset(SUPPORTED_CITIES)
+_CITIES_PAYLOAD = {"cities": list(SUPPORTED_CITIES)}
+# Fixed bodies, encoded once at import and returned as the same response object.
+_HEALTH_RESPONSE = FastJSONResponse({"status": "ok"})
+_CITIES_RESPONSE = FastJSONResponse(_CITIES_PAYLOAD)
 
 
 class ScanRequest(BaseModel):
-    barcode: str = Field(min_length=5, max_length=32)
+    # Digits only: malformed barcodes are rejected before any Open Food Facts round trip.
+    barcode: str = Field(pattern=r"^[0-9]{5,32}$")
     city: str
 
+    @field_validator("barcode", mode="before")
+    @classmethod
+    def _strip_barcode(cls, value: Any) -> Any:
+        return value.strip() if isinstance(value, str) else value
+
+
+class BatchRequest(BaseModel):
+    routes: List[str] = Field(min_length=1, max_length=8)
+
 
 class ProductResult(BaseModel):
     barcode: str
@@ -62,32 +102,153 @@ class ProductResult(BaseModel):
     packaging_text: str
 
 
-def fetch_product_from_open_food_facts(barcode: str) -> Dict[str, Any]:
-    """Fetch product details by barcode."""
+class _TTLCache:
+    """Small LRU cache whose entries expire after a per-entry TTL."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def info(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+class _CircuitBreaker:
+    """Opens after ``fail_max`` consecutive failures and lets one probe through after ``reset_timeout``."""
+
+    def __init__(self, fail_max: int, reset_timeout: float) -> None:
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            # Half-open: re-arm the timer so only this caller probes until it reports back.
+            self._opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.fail_max:
+            self._opened_at = time.monotonic()
+
+
+_off_breaker = _CircuitBreaker(fail_max=10, reset_timeout=30)
+
+# Products found on Open Food Facts, plus short-lived ``None`` entries for unknown barcodes.
+_product_cache = _TTLCache(maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL_SECONDS)
+_NOT_CACHED = object()
+_inflight_products: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+# Scored results per (barcode, city), expiring with the product data they were built from.
+_result_cache = _TTLCache(maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL_SECONDS)
+
+
+def product_cache_info() -> Dict[str, int]:
+    """Hit/miss counters and occupancy of the Open Food Facts lookup cache."""
+    return _product_cache.info()
+
+
+async def fetch_product_from_open_food_facts(barcode: str) -> Dict[str, Any]:
+    """Fetch product details by barcode over the shared keep-alive client."""
+    cached = _product_cache.get(barcode, _NOT_CACHED)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Product not found.")
+    if cached is not _NOT_CACHED:
+        return cached
+
+    # Single-flight: concurrent lookups of one barcode share one request task. Every caller,
+    # the first included, awaits it through shield, so a cancelled caller never cancels it.
+    # The map is only touched on the event loop thread with no await in between, so no lock.
+    task = _inflight_products.get(barcode)
+    if task is None:
+        task = asyncio.ensure_future(_request_product(barcode))
+        _inflight_products[barcode] = task
+        task.add_done_callback(_forget_inflight_product(barcode))
+    return await asyncio.shield(task)
+
+
+def _forget_inflight_product(barcode: str):
+    def forget(task: "asyncio.Task[Dict[str, Any]]") -> None:
+        _inflight_products.pop(barcode, None)
+        if not task.cancelled():
+            task.exception()  # Mark retrieved so a lookup whose callers all left logs nothing.
+
+    return forget
+
+
+async def _request_product(barcode: str) -> Dict[str, Any]:
+    if not _off_breaker.allow():
+        raise HTTPException(status_code=503, detail="Open Food Facts is unavailable; retry shortly.")
     try:
-        response = requests.get(OPEN_FOOD_FACTS_URL.format(barcode=barcode), timeout=12)
-        response.raise_for_status()
-        payload = response.json()
-    except requests.RequestException as exc:
+        response = await app.state.http.get(OPEN_FOOD_FACTS_URL_PREFIX + barcode + OPEN_FOOD_FACTS_URL_SUFFIX)
+        if response.status_code == 404:
+            payload: Dict[str, Any] = {}
+        else:
+            response.raise_for_status()
+            payload = response.json()
+    except (httpx.HTTPError, ValueError) as exc:
+        _off_breaker.record_failure()
         raise HTTPException(status_code=502, detail=f"Open Food Facts request failed: {exc}") from exc
+    _off_breaker.record_success()
 
     if payload.get("status") != 1 or not payload.get("product"):
+        _product_cache.set(barcode, None, ttl=PRODUCT_MISS_TTL_SECONDS)
         raise HTTPException(status_code=404, detail="Product not found.")
 
+    _product_cache.set(barcode, payload["product"])
     return payload["product"]
 
 
 def _build_packaging_text(product: Dict[str, Any]) -> str:
     tags = product.get("packaging_tags") or []
     packaging_raw = product.get("packaging") or ""
-    return " ".join(tags + [packaging_raw]).strip()
+    if not tags and not packaging_raw:
+        return ""
+    return " ".join(chain(tags, (packaging_raw,))).strip()
 
 
-def build_product_result(barcode: str, city: str) -> ProductResult:
-    if city not in SUPPORTED_CITIES:
+async def build_product_result(barcode: str, city: str) -> ProductResult:
+    if city not in _CITIES_SET:
         raise HTTPException(status_code=400, detail=f"Unsupported city. Use one of: {SUPPORTED_CITIES}")
 
-    product = fetch_product_from_open_food_facts(barcode)
+    key = (barcode, city)
+    result = _result_cache.get(key)
+    if result is None:
+        product = await fetch_product_from_open_food_facts(barcode)
+        result = _compute_product_result(barcode, city, product)
+        _result_cache.set(key, result)
+    return result
+
+
+def _compute_product_result(barcode: str, city: str, product: Dict[str, Any]) -> ProductResult:
     product_name = (
         product.get("product_name")
         or product.get("product_name_en")
@@ -100,7 +261,8 @@ def build_product_result(barcode: str, city: str) -> ProductResult:
     disposal = get_disposal_instruction(city, packaging_text)
     alternative = suggest_alternative(impact_score, product_name)
 
-    return ProductResult(
+    # Every field is computed server-side, so skip the validation pass.
+    return ProductResult.model_construct(
         barcode=barcode,
         city=city,
         product_name=product_name,
@@ -120,35 +282,54 @@ def build_product_result(barcode: str, city: str) -> ProductResult:
 @app.on_event("startup")
 def on_startup() -> None:
     init_db()
+    app.state.http = httpx.AsyncClient(
+        # Fail fast when Open Food Facts degrades instead of holding requests for 12s.
+        timeout=httpx.Timeout(connect=2.0, read=5.0, write=2.0, pool=1.0),
+        # Pool limits and HTTP/2 belong to the transport once one is passed explicitly.
+        transport=httpx.AsyncHTTPTransport(
+            retries=1,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+        ),
+    )
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await app.state.http.aclose()
 
 
 @app.get("/health")
-def health() -> Dict[str, str]:
-    return {"status": "ok"}
+def health() -> Response:
+    return _HEALTH_RESPONSE
 
 
 @app.get("/cities")
-def get_cities() -> Dict[str, List[str]]:
-    return {"cities": list(SUPPORTED_CITIES)}
+def get_cities() -> Response:
+    return _CITIES_RESPONSE
 
 
-@app.post("/analyze", response_model=ProductResult)
-def analyze_product(request: ScanRequest) -> ProductResult:
-    return build_product_result(request.barcode.strip(), request.city)
+# response_model=None stops FastAPI re-validating the already-built model (it would
+# otherwise infer one from the return annotation); ``responses`` keeps the OpenAPI schema.
+@app.post("/analyze", response_model=None, responses={200: {"model": ProductResult}})
+async def analyze_product(request: ScanRequest) -> ProductResult:
+    return await build_product_result(request.barcode, request.city)
 
 
 @app.post("/scan")
-def save_scan(request: ScanRequest) -> Dict[str, Any]:
-    result = build_product_result(request.barcode.strip(), request.city)
-    scan_id = insert_scan(
-        product_name=result.product_name,
-        barcode=result.barcode,
-        city=result.city,
-        impact_score=result.impact_score,
-        disposal_type=result.disposal_type,
-        co2_estimate=result.co2_estimate,
-    )
-    scan_row = get_scan_by_id(scan_id)
+async def save_scan(request: ScanRequest) -> Dict[str, Any]:
+    result = await build_product_result(request.barcode, request.city)
+    # SQLite allows one writer at a time; queue writers here instead of on its busy lock.
+    async with _DB_WRITE_LOCK:
+        scan_row = await asyncio.to_thread(
+            insert_scan_returning,
+            product_name=result.product_name,
+            barcode=result.barcode,
+            city=result.city,
+            impact_score=result.impact_score,
+            disposal_type=result.disposal_type,
+            co2_estimate=result.co2_estimate,
+        )
     return {"saved": True, "scan": scan_row, "result": result.model_dump()}
 
 
@@ -158,15 +339,18 @@ def history(limit: int = Query(default=100, ge=1, le=1000)) -> Dict[str, List[Di
 
 
 @app.get("/analytics")
-def analytics() -> Dict[str, Any]:
+async def analytics() -> Dict[str, Any]:
+    # One connection and a shared scalar pass answer every aggregate, off the event loop.
+    bundle = await asyncio.to_thread(get_analytics_bundle, days_week=7, days_trend=30, score_days=7)
+    totals = bundle["totals"]
     return {
-        "total_scans": get_total_scans(),
-        "total_co2": round(get_total_co2(), 2),
-        "environmental_score": get_live_environmental_score(days=7),
-        "weekly_co2": get_weekly_co2_series(),
-        "impact_distribution": get_impact_distribution(),
-        "trend_line": get_trend_line(days=30),
-        "streak": get_current_streak(),
+        "total_scans": totals["total_scans"],
+        "total_co2": round(totals["total_co2"], 2),
+        "environmental_score": totals["environmental_score"],
+        "weekly_co2": bundle["weekly"],
+        "impact_distribution": bundle["dist"],
+        "trend_line": bundle["trend"],
+        "streak": totals["streak"],
     }
 
 
@@ -175,43 +359,76 @@ def streak() -> Dict[str, int]:
     return {"days": get_current_streak()}
 
 
+def _batch_history(query: Dict[str, List[str]]) -> Dict[str, Any]:
+    try:
+        limit = int(query.get("limit", ["100"])[0])
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid history limit.") from exc
+    return history(limit=max(1, min(limit, 1000)))
+
+
+async def _batch_analytics(query: Dict[str, List[str]]) -> Dict[str, Any]:
+    return await analytics()
+
+
+# Coroutine handlers are awaited; sync ones touch SQLite and run on a worker thread.
+_BATCH_ROUTES = {
+    "/analytics": _batch_analytics,
+    "/history": _batch_history,
+    "/streak": lambda query: streak(),
+    "/cities": lambda query: _CITIES_PAYLOAD,
+}
+
+
+@app.post("/batch")
+async def batch(request: BatchRequest) -> Dict[str, Any]:
+    """Serve several read-only GET routes in one round trip, keyed by route."""
+    results: Dict[str, Any] = {}
+    for route in request.routes:
+        parts = urlsplit(route)
+        handler = _BATCH_ROUTES.get(parts.path)
+        if handler is None:
+            raise HTTPException(status_code=400, detail=f"Unsupported batch route: {parts.path}")
+        query = parse_qs(parts.query)
+        if inspect.iscoroutinefunction(handler):
+            results[route] = await handler(query)
+        else:
+            results[route] = await asyncio.to_thread(handler, query)
+    return results
+
+
+def _csv_line(row: tuple, writer: Any, quoted: io.StringIO) -> str:
+    """Format one CSV line like csv.writer, joining directly unless a field needs quoting."""
+    fields = ["" if value is None else str(value) for value in row]
+    line = ",".join(fields)
+    if line.count(",") == len(fields) - 1 and '"' not in line and "\n" not in line and "\r" not in line:
+        return line + "\r\n"
+    quoted.seek(0)
+    quoted.truncate(0)
+    writer.writerow(row)
+    return quoted.getvalue()
+
+
 @app.get("/export/monthly")
 def export_monthly_csv(
     year: int = Query(..., ge=2000, le=2100),
     month: int = Query(..., ge=1, le=12),
 ) -> StreamingResponse:
-    rows = get_monthly_scans(year=year, month=month)
-
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
-    writer.writerow(
-        [
-            "id",
-            "product_name",
-            "barcode",
-            "city",
-            "impact_score",
-            "disposal_type",
-            "co2_estimate",
-            "timestamp",
-        ]
-    )
-    for row in rows:
-        writer.writerow(
-            [
-                row["id"],
-                row["product_name"],
-                row["barcode"],
-                row["city"],
-                row["impact_score"],
-                row["disposal_type"],
-                row["co2_estimate"],
-                row["timestamp"],
-            ]
-        )
+    def iter_csv() -> Iterator[bytes]:
+        # Rows go out in batches of CSV_BATCH_ROWS lines, encoded once per batch.
+        yield _CSV_HEADER
+        quoted = io.StringIO()
+        writer = csv.writer(quoted)
+        batch: List[str] = []
+        for row in iter_monthly_scans_tuples(year, month):
+            batch.append(_csv_line(row, writer, quoted))
+            if len(batch) >= CSV_BATCH_ROWS:
+                yield "".join(batch).encode("utf-8")
+                batch.clear()
+        if batch:
+            yield "".join(batch).encode("utf-8")
 
-    output = io.BytesIO(buffer.getvalue().encode("utf-8"))
     filename = f"ecoscan_report_{year:04d}_{month:02d}.csv"
     headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
-    return StreamingResponse(output, media_type="text/csv", headers=headers)
+    return StreamingResponse(iter_csv(), media_type="text/csv", headers=headers)
 
@@ -2,41 +2,137 @@
 
 from __future__ import annotations
 
-from typing import Dict, List, Tuple
+import re
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, Tuple
+
+try:
+    import hyperscan
+except ImportError:  # pragma: no cover - optional DFA matcher
+    hyperscan = None
 
 IMPACT_TO_CO2 = {"Red": 5.0, "Yellow": 2.5, "Green": 0.8}
 IMPACT_TO_LABEL = {"Red": "High Impact", "Yellow": "Medium Impact", "Green": "Low Impact"}
 IMPACT_TO_POINTS = {"Red": 1, "Yellow": 2, "Green": 3}
 
 
-def _normalize_text(values: List[str]) -> str:
-    return " ".join(values).lower()
+# Every keyword score_product looks for, matched in one pass per text instead of one scan per term.
+_TERMS = (
+    "beef",
+    "meat",
+    "plant-based",
+    "plant",
+    "vegan",
+    "vegetarian",
+    "bulk",
+    "recyclable",
+    "paper",
+    "packaged-foods",
+)
+_TERM_BITS = {term: 1 << i for i, term in enumerate(_TERMS)}
+MEAT_MASK = _TERM_BITS["beef"] | _TERM_BITS["meat"]
+PLANT_MASK = _TERM_BITS["plant"] | _TERM_BITS["vegan"] | _TERM_BITS["vegetarian"] | _TERM_BITS["plant-based"]
+PACKAGING_MASK = _TERM_BITS["bulk"] | _TERM_BITS["recyclable"] | _TERM_BITS["paper"]
+PACKAGED_FOODS_MASK = _TERM_BITS["packaged-foods"]
+
+
+def _build_term_matcher() -> Callable[[str], int]:
+    """Return a function mapping text to a bitmask of the keywords it contains."""
+    if hyperscan is not None:
+        database = hyperscan.Database()
+        database.compile(
+            expressions=[term.encode() for term in _TERMS],
+            ids=list(range(len(_TERMS))),
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_CASELESS] * len(_TERMS),
+        )
+        # The database is shared, but scratch space is not safe to share between concurrent scans.
+        local = threading.local()
+
+        def match_hyperscan(text: str) -> int:
+            matched = 0
+
+            def on_match(term_id: int, start: int, end: int, flags: int, context: object) -> None:
+                nonlocal matched
+                matched |= 1 << term_id
+
+            scratch = getattr(local, "scratch", None)
+            if scratch is None:
+                scratch = local.scratch = hyperscan.Scratch(database)
+            database.scan(text.encode(), match_event_handler=on_match, scratch=scratch)
+            return matched
+
+        return match_hyperscan
+
+    # Zero-width lookahead so overlapping keywords are all reported, like separate `in` checks.
+    # One group per term: lastindex identifies the term without lowercasing the match.
+    pattern = re.compile(
+        "(?=(?:" + "|".join(f"({re.escape(term)})" for term in _TERMS) + "))",
+        re.IGNORECASE,
+    )
+
+    def match_regex(text: str) -> int:
+        matched = 0
+        for found in pattern.finditer(text):
+            matched |= 1 << (found.lastindex - 1)
+        return matched
+
+    return match_regex
+
+
+_match_terms = _build_term_matcher()
+
+
+def _match_fields(values: Tuple[str, ...]) -> int:
+    matched = 0
+    for value in values:
+        matched |= _match_terms(value)
+    return matched
 
 
 def score_product(product_data: Dict) -> Tuple[str, str]:
     """Return (impact_score, explanation) from Open Food Facts product payload."""
-    categories = product_data.get("categories_tags") or []
-    labels = product_data.get("labels_tags") or []
-    packaging = product_data.get("packaging_tags") or []
-    product_name = (product_data.get("product_name") or "").lower()
-    ingredients = (product_data.get("ingredients_text") or "").lower()
-    nova_group = str(product_data.get("nova_group") or "").strip()
-
-    category_blob = _normalize_text(categories)
-    label_blob = _normalize_text(labels)
-    packaging_blob = _normalize_text(packaging)
-    combined = " ".join([category_blob, label_blob, packaging_blob, product_name, ingredients])
-
-    if "beef" in combined or "meat" in combined:
+    return _score_from_fields(
+        tuple(product_data.get("categories_tags") or ()),
+        tuple(product_data.get("labels_tags") or ()),
+        tuple(product_data.get("packaging_tags") or ()),
+        product_data.get("product_name") or "",
+        product_data.get("ingredients_text") or "",
+        str(product_data.get("nova_group") or "").strip(),
+    )
+
+
+@lru_cache(maxsize=4096)
+def _score_from_fields(
+    categories: Tuple[str, ...],
+    labels: Tuple[str, ...],
+    packaging: Tuple[str, ...],
+    product_name: str,
+    ingredients: str,
+    nova_group: str,
+) -> Tuple[str, str]:
+    # Matching is caseless and no keyword contains a space, so scanning each raw field
+    # equals scanning the old lowercased, space-joined blob without building it.
+    category_bits = _match_fields(categories)
+    packaging_bits = _match_fields(packaging)
+    matched = (
+        category_bits
+        | packaging_bits
+        | _match_fields(labels)
+        | _match_terms(product_name)
+        | _match_terms(ingredients)
+    )
+
+    if matched & MEAT_MASK:
         return "Red", "Category indicates meat-heavy product (higher footprint)."
 
-    if nova_group == "4" or "packaged-foods" in category_blob:
+    if nova_group == "4" or category_bits & PACKAGED_FOODS_MASK:
         return "Yellow", "Likely ultra-processed packaged food."
 
-    if any(term in combined for term in ["plant", "vegan", "vegetarian", "plant-based"]):
+    if matched & PLANT_MASK:
         return "Green", "Plant-based indicators found."
 
-    if any(term in packaging_blob for term in ["bulk", "recyclable", "paper"]):
+    if packaging_bits & PACKAGING_MASK:
         return "Green", "Lower-impact packaging indicators found."
 
     return "Yellow", "Insufficient certainty; assigned medium impact."
@@ -1,4 +1,5 @@
-const CACHE_NAME = "ecoscan-pwa-v1";
+const CACHE_VERSION = "v3";
+const CACHE_NAME = `ecoscan-pwa-${CACHE_VERSION}`;
 const APP_SHELL = [
   "/",
   "/app",
@@ -6,12 +7,18 @@ const APP_SHELL = [
   "/app/static/manifest.json",
   "/app/static/mobile.css",
   "/app/static/icons/icon-192.png",
-  "/app/static/icons/icon-512.png"
+  "/app/static/icons/icon-512.png",
+  "/static/manifest.json",
+  "/static/mobile.css",
+  "/static/icons/icon-192.png",
+  "/static/icons/icon-512.png"
 ];
+const API_ROUTE = /\/(analyze|scan|history|analytics|batch)(\/|\?|$)/;
 
 self.addEventListener("install", (event) => {
   event.waitUntil(
-    caches.open(CACHE_NAME).then((cache) => cache.addAll(APP_SHELL)).catch(() => Promise.resolve())
+    // Only one of the /app/static/ and /static/ layouts exists, so each URL is cached on its own.
+    caches.open(CACHE_NAME).then((cache) => Promise.allSettled(APP_SHELL.map((url) => cache.add(url))))
   );
   self.skipWaiting();
 });
@@ -25,35 +32,66 @@ self.addEventListener("activate", (event) => {
   self.clients.claim();
 });
 
+const putInCache = (request, response) => {
+  if (response && response.status === 200) {
+    const clone = response.clone();
+    caches.open(CACHE_NAME).then((cache) => cache.put(request, clone));
+  }
+  return response;
+};
+
+// API data must be fresh; the cached copy is only an offline fallback.
+const networkFirst = (request) =>
+  fetch(request)
+    .then((response) => putInCache(request, response))
+    .catch(() => caches.match(request));
+
+const offlineShell = () =>
+  caches
+    .match("/")
+    .then((cached) => cached || caches.match("/app/"))
+    .then((cached) => cached || Response.error());
+
+// Manifest, css and icons only change on deploy, which bumps CACHE_VERSION.
+const cacheFirst = (request) =>
+  caches.match(request).then(
+    (cached) =>
+      cached ||
+      fetch(request)
+        .then((response) => putInCache(request, response))
+        .catch(() => Response.error())
+  );
+
+// Pages and scripts name Streamlit's hashed bundles, so they are refreshed in the background.
+const staleWhileRevalidate = (request) =>
+  caches.match(request).then((cached) => {
+    const network = fetch(request)
+      .then((response) => putInCache(request, response))
+      .catch(() => cached || (request.destination === "document" ? offlineShell() : Response.error()));
+    return cached || network;
+  });
+
 self.addEventListener("fetch", (event) => {
   const request = event.request;
   if (request.method !== "GET") return;
 
   const url = new URL(request.url);
-  const shouldCache =
-    request.destination === "document" ||
+  if (API_ROUTE.test(url.pathname)) {
+    event.respondWith(networkFirst(request));
+    return;
+  }
+
+  const isAsset =
     request.destination === "style" ||
-    request.destination === "script" ||
     request.destination === "image" ||
-    url.pathname.includes("/history") ||
-    url.pathname.includes("/analytics") ||
-    url.pathname.includes("/app/static/");
-
-  if (!shouldCache) return;
-
-  event.respondWith(
-    caches.match(request).then((cached) => {
-      const networkFetch = fetch(request)
-        .then((response) => {
-          if (response && response.status === 200) {
-            const clone = response.clone();
-            caches.open(CACHE_NAME).then((cache) => cache.put(request, clone));
-          }
-          return response;
-        })
-        .catch(() => cached || caches.match("/") || caches.match("/app/"));
-
-      return cached || networkFetch;
-    })
-  );
+    request.destination === "manifest" ||
+    url.pathname.includes("/static/");
+  if (isAsset) {
+    event.respondWith(cacheFirst(request));
+    return;
+  }
+
+  if (request.destination === "document" || request.destination === "script") {
+    event.respondWith(staleWhileRevalidate(request));
+  }
 });